@@ -0,0 +1,102 @@
+# admission.py - Bound concurrent solves and coalesce identical requests
+#
+# A solve is CPU-bound and holds the GIL, so running several at once in one
+# process only makes all of them slower. AdmissionController lets
+# `max_active` solves run, keeps at most `max_queued` more waiting for a
+# slot, and rejects anything beyond that with Overloaded, whose retry_after
+# estimates when a slot will be free from the recent solve durations.
+#
+# Requests with the same key (dataset version + options) that arrive while
+# one is in flight wait for that solve and share its result instead of
+# taking a slot of their own. Limits are per process: under gunicorn every
+# worker has its own controller.
+import math
+import threading
+import time
+
+
+class Overloaded(Exception):
+    """Raised when both the running solves and the queue are full"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Too many solves in progress, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+class _Call:
+    """One in-flight solve and the requests waiting for its result"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class AdmissionController:
+    def __init__(self, max_active=1, max_queued=2, default_seconds=10):
+        self.max_active = max(1, max_active)
+        self.max_queued = max(0, max_queued)
+        self._slots = threading.Semaphore(self.max_active)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._admitted = 0  # running + queued leaders
+        self._average_seconds = default_seconds
+        self.stats = {'completed': 0, 'coalesced': 0, 'rejected': 0}
+
+    def run(self, key, solve):
+        """Return (solve() result, coalesced) for key, sharing an in-flight solve
+
+        Raises Overloaded when the request can neither join an identical solve
+        nor get a running or queued slot. Exceptions from solve() propagate to
+        every request coalesced onto it.
+        """
+        leader = False
+        with self._lock:
+            call = self._in_flight.get(key)
+            if call is not None:
+                self.stats['coalesced'] += 1
+            elif self._admitted >= self.max_active + self.max_queued:
+                self.stats['rejected'] += 1
+                raise Overloaded(self.retry_after())
+            else:
+                call = self._in_flight[key] = _Call()
+                self._admitted += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            with self._slots:
+                started = time.monotonic()
+                call.result = solve()
+                self._record(time.monotonic() - started)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                self._admitted -= 1
+            call.done.set()
+        return call.result, False
+
+    def retry_after(self):
+        """Seconds until the queue has likely drained by one slot"""
+        rounds = math.ceil((self._admitted - self.max_active + 1) / self.max_active)
+        return max(1, math.ceil(self._average_seconds * max(1, rounds)))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._in_flight), admitted=self._admitted,
+                        max_active=self.max_active, max_queued=self.max_queued,
+                        average_seconds=round(self._average_seconds, 2))
+
+    def _record(self, seconds):
+        # Exponential moving average of solve durations for retry_after
+        with self._lock:
+            self._average_seconds = 0.7 * self._average_seconds + 0.3 * seconds
+            self.stats['completed'] += 1
@@ -6,71 +6,138 @@
 # This software is proprietary and confidential.
 # ============================================================================
 
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, Blueprint, render_template, jsonify, request, send_file
 from flask_cors import CORS
-import json
-import csv
+import datetime
 import io
+import json
+import math
 import os
-from data_loader import DataLoader
-from enhanced_csp_model import EnhancedCSPTimetable, Course, Instructor, Room, Timeslot
+import re
+import threading
+from admission import AdmissionController, Overloaded
+from checkpoint import Checkpointer
+from constraints import CONSTRAINTS, DEFAULT_CONSTRAINTS, DEFAULT_PARAMETERS, validate_constraint_set
+from dataset import DatasetStore, merge_collection, parse_cohort, parse_course, parse_instructor, parse_room
+from scenarios import pool_size, solve_scenarios
+from storage import TimetableStorage
+from exports import ARCHIVE_FORMATS, ARCHIVE_GROUPS, build_archive, result_to_json, schedule_to_csv
+from generation import GENERATE_MODES, solve
+
+# All routes live on this blueprint; create_app() attaches it to an app instance
+api = Blueprint('api', __name__)
+
+# Checkpoints of generate requests that pass a job_id, one file per job
+CHECKPOINT_DIR = os.environ.get('TIMETABLE_CHECKPOINT_DIR', 'checkpoints')
+JOB_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+# job_id -> (request key, requests sharing it) for jobs in flight in this process
+running_jobs = {}
+running_jobs_lock = threading.Lock()
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+# Persistent store: catalogue edits and generated timetable history
+storage = TimetableStorage(os.environ.get('TIMETABLE_DB', 'timetable.db'))
 
-# Global data loader
-data_loader = DataLoader()
-current_timetable = None
+# Versioned dataset: each request pins dataset_store.current() once and
+# writers publish a whole new snapshot, so requests never see partial updates
+dataset_store = DatasetStore(storage)
+
+# Longest solve a request may ask for. gunicorn.conf.py derives graceful_timeout
+# from it so a reload lets running and queued solves finish
+MAX_SOLVE_SECONDS = int(os.environ.get('TIMETABLE_MAX_TIMEOUT', 120))
+
+# Per-process limit on concurrent solves (generate and scenarios); identical
+# in-flight requests share one solve, and a full queue answers 429
+admission = AdmissionController(
+    max_active=int(os.environ.get('TIMETABLE_MAX_SOLVES', 1)),
+    max_queued=int(os.environ.get('TIMETABLE_SOLVE_QUEUE', 2))
+)
+
+# Processes one admitted solve may fan out to (decomposed mode, scenario
+# batches): the machine-wide TIMETABLE_SOLVER_PROCESSES budget (default one per
+# core) split over the web workers (TIMETABLE_WORKERS, exported by
+# gunicorn.conf.py) and the solves each of them runs at once
+SOLVE_PROCESSES = max(1, int(os.environ.get('TIMETABLE_SOLVER_PROCESSES', os.cpu_count() or 1)) //
+                      (int(os.environ.get('TIMETABLE_WORKERS', 1)) * admission.max_active))
 
 # Load data on startup
-def initialize_data():
-    """Load data from CSV files"""
+def initialize_data(from_csv=False, raise_errors=False):
+    """Load the catalogue from the database, seeding it from the CSV files if empty
+    
+    A CSV file that fails to parse leaves the stored catalogue untouched.
+    """
     try:
-        data_loader.load_all_data('Courses.csv', 'instructors.csv', 'Rooms.csv', 'TimeSlots.csv')
+        if from_csv or storage.is_empty():
+            dataset_store.load_csv('Courses.csv', 'instructors.csv', 'Rooms.csv', 'TimeSlots.csv',
+                                   'Cohorts.csv')
+        else:
+            dataset_store.reload()
         print("✅ Data loaded successfully!")
         return True
     except Exception as e:
         print(f"❌ Error loading data: {e}")
+        if raise_errors:
+            raise
         return False
 
-# Initialize data when app starts
-initialize_data()
+# ============================================================================
+# APPLICATION FACTORY
+# ============================================================================
+
+def create_app(preload_data=True):
+    """Create the Flask application
+
+    Data is loaded at most once per process. Under gunicorn with
+    ``preload_app = True`` this runs in the master, so forked workers share
+    the parsed dataset copy-on-write instead of re-reading the CSVs.
+    """
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for all routes
+    app.register_blueprint(api)
+
+    if preload_data and dataset_store.current().version == 0:
+        initialize_data()
+
+    return app
 
 # ============================================================================
 # API ROUTES
 # ============================================================================
 
-@app.route('/')
+@api.route('/')
 def index():
     """Serve the main page"""
     return render_template('index.html')
 
-@app.route('/test')
+@api.route('/test')
 def test_page():
     """Serve the test page"""
     return render_template('test.html')
 
-@app.route('/api/data/summary', methods=['GET'])
+@api.route('/api/data/summary', methods=['GET'])
 def get_data_summary():
     """Get summary of all available data"""
     try:
+        dataset = dataset_store.current()
         return jsonify({
             'success': True,
             'data': {
-                'courses_count': len(data_loader.get_courses()),
-                'instructors_count': len(data_loader.get_instructors()),
-                'rooms_count': len(data_loader.get_rooms()),
-                'timeslots_count': len(data_loader.get_timeslots())
-            }
+                'courses_count': len(dataset.get_courses()),
+                'instructors_count': len(dataset.get_instructors()),
+                'rooms_count': len(dataset.get_rooms()),
+                'timeslots_count': len(dataset.get_timeslots()),
+                'cohorts_count': len(dataset.get_cohorts()),
+                'dataset_version': dataset.version
+            },
+            'admission': admission.snapshot()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/courses', methods=['GET'])
+@api.route('/api/courses', methods=['GET'])
 def get_courses():
     """Get all courses"""
     try:
-        courses = data_loader.get_courses()
+        courses = dataset_store.current().get_courses()
         return jsonify({
             'success': True,
             'courses': [c.to_dict() for c in courses]
@@ -78,11 +145,11 @@ def get_courses():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/instructors', methods=['GET'])
+@api.route('/api/instructors', methods=['GET'])
 def get_instructors():
     """Get all instructors"""
     try:
-        instructors = data_loader.get_instructors()
+        instructors = dataset_store.current().get_instructors()
         return jsonify({
             'success': True,
             'instructors': [i.to_dict() for i in instructors]
@@ -90,11 +157,11 @@ def get_instructors():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/rooms', methods=['GET'])
+@api.route('/api/rooms', methods=['GET'])
 def get_rooms():
     """Get all rooms"""
     try:
-        rooms = data_loader.get_rooms()
+        rooms = dataset_store.current().get_rooms()
         return jsonify({
             'success': True,
             'rooms': [r.to_dict() for r in rooms]
@@ -102,11 +169,11 @@ def get_rooms():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/timeslots', methods=['GET'])
+@api.route('/api/timeslots', methods=['GET'])
 def get_timeslots():
     """Get all timeslots"""
     try:
-        timeslots = data_loader.get_timeslots()
+        timeslots = dataset_store.current().get_timeslots()
         return jsonify({
             'success': True,
             'timeslots': [t.to_dict() for t in timeslots]
@@ -114,127 +181,275 @@ def get_timeslots():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/generate', methods=['POST'])
+@api.route('/api/cohorts', methods=['GET'])
+def get_cohorts():
+    """Get all student cohorts"""
+    try:
+        cohorts = dataset_store.current().get_cohorts()
+        return jsonify({
+            'success': True,
+            'cohorts': [c.to_dict() for c in cohorts]
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/constraints', methods=['GET'])
+def get_constraints():
+    """List registered constraints, the default set and tunable parameters"""
+    return jsonify({
+        'success': True,
+        'constraints': [c.to_dict() for c in CONSTRAINTS.values()],
+        'default_constraints': DEFAULT_CONSTRAINTS,
+        'parameters': DEFAULT_PARAMETERS
+    })
+
+@api.route('/api/generate', methods=['POST'])
 def generate_timetable():
     """Generate a new timetable - AUTO-SCHEDULES ALL COURSES"""
-    global current_timetable
-    
     try:
         data = request.get_json() if request.get_json() else {}
         timeout = data.get('timeout', 60)  # Reduced to 60 seconds (greedy algorithm is MUCH faster)
+        mode = data.get('mode', 'greedy')
+        if mode not in GENERATE_MODES:
+            return jsonify({'success': False, 'error': f"Unknown mode: {mode} (expected one of {', '.join(GENERATE_MODES)})"}), 400
+        error = (check_timeout(timeout) or check_workers(data.get('workers')) or
+                 check_seconds('optimize_seconds', data.get('optimize_seconds', 5)))
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
-        # Get ALL courses with qualified instructors (no manual selection!)
-        all_courses = data_loader.get_courses()
-        schedulable_courses = []
+        # Optional constraint set: names from /api/constraints plus parameter overrides
+        constraints = data.get('constraints')
+        parameters = data.get('parameters')
+        try:
+            validate_constraint_set(constraints, parameters)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        print(f"\n🔍 Analyzing all {len(all_courses)} courses...")
-        
-        for course in all_courses:
-            qualified = [instr for instr in data_loader.get_instructors() 
-                        if course.course_id in instr.qualified_courses]
-            if qualified:
-                schedulable_courses.append((course, len(qualified)))
-        
-        # Sort by number of qualified instructors (better success rate)
-        schedulable_courses.sort(key=lambda x: x[1], reverse=True)
-        
-        # USE ALL SCHEDULABLE COURSES - NO LIMIT!
-        selected_courses = [course for course, count in schedulable_courses]
-        
-        if not selected_courses:
-            return jsonify({'success': False, 'error': 'No courses with qualified instructors found'}), 400
+        # Optional warm start: a previous timetable (object), its id, or true for the latest
+        warm_start = data.get('warm_start')
+        if warm_start is not None and warm_start is not False:
+            if mode == 'decomposed':
+                return jsonify({'success': False, 'error': "warm_start is not supported with mode 'decomposed'"}), 400
+            if not isinstance(warm_start, dict):
+                stored = storage.get_timetable(None if warm_start is True else warm_start)
+                if stored is None:
+                    return jsonify({'success': False, 'error': 'Warm-start timetable not found'}), 404
+                warm_start = stored[0]
+        else:
+            warm_start = None
         
-        print(f"✅ Found {len(selected_courses)} schedulable courses (out of {len(all_courses)} total)")
-        print(f"🚀 Attempting to schedule ALL {len(selected_courses)} courses across ALL available time slots...")
-        print(f"⏱️  Timeout: {timeout} seconds")
+        # Optional job_id: checkpoint progress and resume it after a restart
+        job_id = data.get('job_id')
+        if job_id is not None:
+            if not isinstance(job_id, str) or not JOB_ID_PATTERN.fullmatch(job_id):
+                return jsonify({'success': False, 'error': 'job_id must be 1-64 letters, digits, _ or -'}), 400
+            if mode == 'decomposed' or warm_start is not None:
+                return jsonify({'success': False, 'error': "job_id cannot be combined with mode 'decomposed' or warm_start"}), 400
+            error = check_seconds('checkpoint_interval', data.get('checkpoint_interval', 5))
+            if error:
+                return jsonify({'success': False, 'error': error}), 400
         
-        # Create and run solver with ALL time slots
-        solver = EnhancedCSPTimetable(
-            courses=selected_courses,
-            instructors=data_loader.get_instructors(),
-            rooms=data_loader.get_rooms(),
-            timeslots=data_loader.get_timeslots()  # Uses ALL time slots
-        )
+        # Pin one dataset version for the whole solve
+        dataset = dataset_store.current()
         
-        print(f"\n{'='*80}")
-        print(f"🚀 STARTING ENHANCED CSP SOLVER")
-        print(f"{'='*80}")
-        success = solver.solve_enhanced(timeout_seconds=timeout)
+        # Identical requests against the same version share one solve; beyond
+        # the concurrency limit and queue depth, callers are told to retry
+        key = ('generate', dataset.version, json.dumps(data, sort_keys=True, default=str))
+        # Two different requests must not share a job's checkpoint
+        if job_id is not None and not claim_job(job_id, key):
+            return jsonify({'success': False, 'error': f'Job {job_id} is already running with other options'}), 409
+        try:
+            result, coalesced = admission.run(key, lambda: run_generation(
+                dataset, data, mode, timeout, constraints, parameters, warm_start))
+        except Overloaded as e:
+            return overloaded_response(e)
+        finally:
+            if job_id is not None:
+                release_job(job_id)
+        if coalesced:
+            result = dict(result, coalesced=True)
         
-        # Store current timetable
-        current_timetable = solver
+        return jsonify(result)
         
-        # Export results
-        result = solver.export_to_dict()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error generating timetable: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def run_generation(dataset, data, mode, timeout, constraints, parameters, warm_start):
+    """Solve one validated /api/generate request against a pinned dataset version"""
+    print(f"\n{'='*80}")
+    print(f"🚀 STARTING ENHANCED CSP SOLVER ({mode})")
+    print(f"⏱️  Timeout: {timeout} seconds")
+    print(f"{'='*80}")
+    
+    # With a job_id, save progress periodically and pick up a previous run's checkpoint
+    # (only a rerun with the same options resumes it)
+    checkpoint = None
+    if data.get('job_id'):
+        options = {k: v for k, v in data.items() if k not in ('job_id', 'checkpoint_interval')}
+        checkpoint = Checkpointer(os.path.join(CHECKPOINT_DIR, f"{data['job_id']}.json"),
+                                  interval=data.get('checkpoint_interval', 5), dataset_version=dataset.version,
+                                  options=json.loads(json.dumps(options, sort_keys=True, default=str)))
+    
+    solver = solve(dataset, mode, timeout, seed=data.get('seed'), workers=pool_workers(data.get('workers')),
+                   optimize_seconds=data.get('optimize_seconds', 5), constraints=constraints,
+                   parameters=parameters, warm_start=warm_start, checkpoint=checkpoint)
+    
+    # Export results and store them in the timetable history
+    result = solver.export_to_dict()
+    result['dataset_version'] = dataset.version
+    if solver.warm_start_stats is not None:
+        result['warm_start'] = solver.warm_start_stats
+    if solver.resume_stats is not None:
+        result['resumed'] = solver.resume_stats
+    result['timetable_id'] = storage.save_timetable(
+        result, dataset.version, solver.get_statistics())
+    if checkpoint is not None:
+        # The result is in the history now; the job is finished
+        checkpoint.discard()
+    
+    scheduled = result["scheduled_courses"]
+    total = result["total_courses"]
+    percentage = (scheduled / total * 100) if total > 0 else 0
+    
+    result['message'] = f'Successfully scheduled {scheduled} out of {total} courses ({percentage:.1f}%)'
+    
+    print(f"\n{'='*80}")
+    print(f"✅ GENERATION COMPLETE")
+    print(f"📊 Result: {scheduled}/{total} courses ({percentage:.1f}%)")
+    print(f"{'='*80}\n")
+    
+    return result
+
+@api.route('/api/generate/scenarios', methods=['POST'])
+def generate_scenarios():
+    """Solve several what-if variants of the current dataset and rank them
+    
+    Body: {"scenarios": [{"name": ..., "remove_rooms": [...], ...}, ...],
+           "timeout": 60, "workers": 4, "seed": 1, "include_base": true,
+           "include_schedules": false, "constraints": [...], "parameters": {...}}
+    See scenarios.py for the supported delta keys.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        scenarios = data.get('scenarios', [])
+        if not isinstance(scenarios, list) or not scenarios:
+            return jsonify({'success': False, 'error': "'scenarios' must be a non-empty list"}), 400
+        if data.get('include_base', True):
+            scenarios = [{'name': 'Base'}] + scenarios
         
-        scheduled = result["scheduled_courses"]
-        total = result["total_courses"]
-        percentage = (scheduled / total * 100) if total > 0 else 0
+        error = check_workers(data.get('workers'))
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
-        result['message'] = f'Successfully scheduled {scheduled} out of {total} courses ({percentage:.1f}%)'
+        # Scenarios run in rounds of one per worker process; the whole batch must fit the limit
+        workers = pool_workers(data.get('workers'))
+        rounds = math.ceil(len(scenarios) / pool_size(workers, len(scenarios)))
+        error = check_timeout(data.get('timeout', 60), rounds)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
-        print(f"\n{'='*80}")
-        print(f"✅ GENERATION COMPLETE")
-        print(f"📊 Result: {scheduled}/{total} courses ({percentage:.1f}%)")
-        print(f"{'='*80}\n")
+        # Pin one dataset version as the base for every scenario
+        dataset = dataset_store.current()
+        base = {
+            'courses': dataset.get_courses(),
+            'instructors': dataset.get_instructors(),
+            'rooms': dataset.get_rooms(),
+            'timeslots': dataset.get_timeslots(),
+            'cohorts': dataset.get_cohorts()
+        }
         
-        return jsonify(result)
+        print(f"\n🧪 Solving {len(scenarios)} scenarios on dataset v{dataset.version}...")
+        key = ('scenarios', dataset.version, json.dumps(data, sort_keys=True, default=str))
+        try:
+            results, coalesced = admission.run(key, lambda: solve_scenarios(
+                base, scenarios,
+                timeout=data.get('timeout', 60),
+                workers=workers,
+                seed=data.get('seed'),
+                include_schedules=data.get('include_schedules', False),
+                constraints=data.get('constraints'),
+                parameters=data.get('parameters'),
+                domain_cache=dataset.domain_cache
+            ))
+        except Overloaded as e:
+            return overloaded_response(e)
         
+        return jsonify({
+            'success': True,
+            'dataset_version': dataset.version,
+            'scenarios': results
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        print(f"❌ Error generating timetable: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"❌ Error solving scenarios: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/timetable/current', methods=['GET'])
+@api.route('/api/timetable/current', methods=['GET'])
 def get_current_timetable():
-    """Get the current timetable"""
-    global current_timetable
-    
-    if current_timetable is None:
+    """Get the current (latest) timetable, or a past one with ?id="""
+    stored = load_stored_timetable()
+    if stored is None:
         return jsonify({'success': False, 'error': 'No timetable generated yet'}), 404
     
     try:
-        result = current_timetable.export_to_dict()
+        result, statistics = stored
         return jsonify(result)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/timetable/export/csv', methods=['GET'])
+@api.route('/api/timetables', methods=['GET'])
+def list_timetables():
+    """List previously generated timetables, newest first"""
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify({
+            'success': True,
+            'timetables': storage.list_timetables(limit)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/timetables/<int:timetable_id>', methods=['GET'])
+def get_timetable(timetable_id):
+    """Get a stored timetable by id without re-solving"""
+    stored = storage.get_timetable(timetable_id)
+    if stored is None:
+        return jsonify({'success': False, 'error': 'Timetable not found'}), 404
+    
+    result, statistics = stored
+    return jsonify(result)
+
+@api.route('/api/timetables/<int:timetable_id>/entries', methods=['GET'])
+def get_timetable_entries(timetable_id):
+    """Query a stored timetable by instructor_id, room_id and/or day"""
+    try:
+        entries = storage.query_entries(
+            timetable_id,
+            instructor_id=request.args.get('instructor_id'),
+            room_id=request.args.get('room_id'),
+            day=request.args.get('day')
+        )
+        return jsonify({'success': True, 'entries': entries})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/timetable/export/csv', methods=['GET'])
 def export_timetable_csv():
     """Export current timetable as CSV"""
-    global current_timetable
-    
-    if current_timetable is None:
+    stored = load_stored_timetable()
+    if stored is None:
         return jsonify({'success': False, 'error': 'No timetable generated yet'}), 404
     
     try:
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Course ID', 'Course Name', 'Day', 'Start Time', 'End Time', 
-                        'Room', 'Instructor', 'Course Type'])
-        
-        # Write data
-        timetable_data = current_timetable.export_to_dict()
-        for entry in timetable_data['schedule']:
-            writer.writerow([
-                entry['course_id'],
-                entry['course_name'],
-                entry['day'],
-                entry['start_time'],
-                entry['end_time'],
-                entry['room_id'],
-                entry['instructor_name'],
-                entry['course_type']
-            ])
-        
-        # Create response
-        output.seek(0)
+        timetable_data, statistics = stored
         return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
+            io.BytesIO(schedule_to_csv(timetable_data['schedule']).encode('utf-8')),
             mimetype='text/csv',
             as_attachment=True,
             download_name='timetable.csv'
@@ -242,19 +457,18 @@ def export_timetable_csv():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/timetable/export/json', methods=['GET'])
+@api.route('/api/timetable/export/json', methods=['GET'])
 def export_timetable_json():
     """Export current timetable as JSON"""
-    global current_timetable
-    
-    if current_timetable is None:
+    stored = load_stored_timetable()
+    if stored is None:
         return jsonify({'success': False, 'error': 'No timetable generated yet'}), 404
     
     try:
-        result = current_timetable.export_to_dict()
+        result, statistics = stored
         
         # Create JSON file in memory
-        json_str = json.dumps(result, indent=2)
+        json_str = result_to_json(result)
         
         return send_file(
             io.BytesIO(json_str.encode('utf-8')),
@@ -265,16 +479,47 @@ def export_timetable_json():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/statistics', methods=['GET'])
+@api.route('/api/timetable/export/archive', methods=['GET'])
+def export_timetable_archive():
+    """Zip with one timetable file per instructor and per room
+    
+    Query: ?id=&formats=csv,json,ics&groups=instructors,rooms
+           &term_start=YYYY-MM-DD&weeks=15 (term_start/weeks place the iCalendar events)
+    """
+    stored = load_stored_timetable()
+    if stored is None:
+        return jsonify({'success': False, 'error': 'No timetable generated yet'}), 404
+    
+    try:
+        result, statistics = stored
+        formats = request.args.get('formats', ','.join(ARCHIVE_FORMATS)).split(',')
+        groups = request.args.get('groups', ','.join(ARCHIVE_GROUPS)).split(',')
+        term_start = request.args.get('term_start')
+        archive = build_archive(
+            result, formats, groups,
+            term_start=datetime.date.fromisoformat(term_start) if term_start else None,
+            weeks=request.args.get('weeks', 15, type=int)
+        )
+        return send_file(
+            io.BytesIO(archive),
+            mimetype='application/zip',
+            as_attachment=True,
+            download_name='timetables.zip'
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/statistics', methods=['GET'])
 def get_statistics():
     """Get statistics about the current timetable"""
-    global current_timetable
-    
-    if current_timetable is None:
+    stored = load_stored_timetable()
+    if stored is None:
         return jsonify({'success': False, 'error': 'No timetable generated yet'}), 404
     
     try:
-        stats = current_timetable.get_statistics()
+        result, stats = stored
         return jsonify({
             'success': True,
             'statistics': stats
@@ -282,7 +527,26 @@ def get_statistics():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/courses/add', methods=['POST'])
+@api.route('/api/timetable/diagnostics', methods=['GET'])
+def get_diagnostics():
+    """Explain why sessions of the current (or ?id=) timetable were left unscheduled"""
+    stored = load_stored_timetable()
+    if stored is None:
+        return jsonify({'success': False, 'error': 'No timetable generated yet'}), 404
+    
+    try:
+        result, stats = stored
+        return jsonify({
+            'success': True,
+            'scheduled_courses': result['scheduled_courses'],
+            'total_courses': result['total_courses'],
+            # Timetables stored before diagnostics existed have none
+            'diagnostics': result.get('diagnostics')
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/courses/add', methods=['POST'])
 def add_course():
     """Add a new course"""
     try:
@@ -294,48 +558,124 @@ def add_course():
             if field not in data:
                 return jsonify({'success': False, 'error': f'Missing field: {field}'}), 400
         
-        # Check if course already exists
-        existing = [c for c in data_loader.get_courses() if c.course_id == data['course_id']]
-        if existing:
-            return jsonify({'success': False, 'error': 'Course ID already exists'}), 400
+        new_course = parse_course(data)
         
-        # Add course
-        new_course = Course(data['course_id'], data['name'], data['credits'], data['type'])
-        data_loader.courses.append(new_course)
+        def add(dataset):
+            # Check if course already exists (against the latest version)
+            if dataset.get_course(new_course.course_id):
+                raise ValueError('Course ID already exists')
+            version = storage.insert_course(new_course)
+            return {'courses': dataset.courses + (new_course,), 'version': version}
         
-        # Save to CSV
-        save_courses_to_csv()
+        # Insert the row, then publish the new version
+        dataset_store.update(add)
         
         return jsonify({'success': True, 'message': 'Course added successfully'})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/courses/delete/<course_id>', methods=['DELETE'])
+@api.route('/api/courses/delete/<course_id>', methods=['DELETE'])
 def delete_course(course_id):
     """Delete a course"""
     try:
-        original_count = len(data_loader.courses)
-        data_loader.courses = [c for c in data_loader.courses if c.course_id != course_id]
-        
-        if len(data_loader.courses) == original_count:
-            return jsonify({'success': False, 'error': 'Course not found'}), 404
+        def delete(dataset):
+            version = storage.delete_course(course_id)
+            return {'courses': tuple(c for c in dataset.courses if c.course_id != course_id),
+                    'version': version}
         
-        # Save to CSV
-        save_courses_to_csv()
+        # Delete the row, then publish the new version
+        dataset_store.update(delete)
         
         return jsonify({'success': True, 'message': 'Course deleted successfully'})
+    except KeyError:
+        return jsonify({'success': False, 'error': 'Course not found'}), 404
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/<entity>/batch', methods=['POST'])
+def batch_update(entity):
+    """Upsert and delete many courses, instructors or rooms in one request
+    
+    Body: {"upsert": [{...}, ...], "delete": ["ID", ...]}
+    The whole batch is validated first; if anything is invalid nothing is
+    applied. Otherwise it is written in one transaction and published as
+    one new dataset version.
+    """
+    if entity not in BATCH_ENTITIES:
+        return jsonify({'success': False, 'error': f'Unknown entity: {entity}'}), 404
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        upserts = data.get('upsert', [])
+        deletes = data.get('delete', [])
+        if not isinstance(upserts, list) or not isinstance(deletes, list):
+            return jsonify({'success': False, 'error': "'upsert' and 'delete' must be lists"}), 400
+        
+        key, required_fields, parse = BATCH_ENTITIES[entity]
+        lookup = {'courses': 'get_course', 'instructors': 'get_instructor', 'rooms': 'get_room',
+                  'cohorts': 'get_cohort'}[entity]
+        
+        def apply(dataset):
+            errors = []
+            items = []
+            seen = set()
+            for index, record in enumerate(upserts):
+                missing = [f for f in required_fields if not isinstance(record, dict) or f not in record]
+                if missing:
+                    errors.append(f'upsert[{index}]: missing field(s): {", ".join(missing)}')
+                    continue
+                try:
+                    item = parse(record)
+                except ValueError as e:
+                    errors.append(f'upsert[{index}]: {e}')
+                    continue
+                if entity == 'cohorts':
+                    # Cohorts may only name courses of the pinned version
+                    unknown = [course_id for course_id, _ in item.sessions if not dataset.get_course(course_id)]
+                    if unknown:
+                        errors.append(f'upsert[{index}]: unknown course(s): {", ".join(unknown)}')
+                        continue
+                item_id = getattr(item, key)
+                if item_id in seen:
+                    errors.append(f'upsert[{index}]: duplicate {key} {item_id}')
+                seen.add(item_id)
+                items.append(item)
+            for index, item_id in enumerate(deletes):
+                if not isinstance(item_id, str):
+                    errors.append(f'delete[{index}]: {key} must be a string')
+                elif item_id in seen:
+                    errors.append(f'delete: {item_id} is also upserted')
+                elif not getattr(dataset, lookup)(item_id):
+                    errors.append(f'delete: {item_id} not found')
+            if errors:
+                raise BatchValidationError(errors)
+            
+            version = storage.apply_batch(entity, upserts=items, deletes=deletes)
+            return {entity: merge_collection(getattr(dataset, entity), key, items, deletes),
+                    'version': version}
+        
+        dataset = dataset_store.update(apply)
+        return jsonify({
+            'success': True,
+            'message': f'Applied {len(upserts)} upsert(s) and {len(deletes)} delete(s) to {entity}',
+            'dataset_version': dataset.version
+        })
+    except BatchValidationError as e:
+        return jsonify({'success': False, 'error': 'Batch rejected', 'errors': e.errors}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/reload', methods=['POST'])
+@api.route('/api/reload', methods=['POST'])
 def reload_data():
-    """Reload all data from CSV files"""
+    """Reload all data from the database, or re-seed it from the CSV files"""
     try:
-        success = initialize_data()
-        if success:
-            return jsonify({'success': True, 'message': 'Data reloaded successfully'})
-        else:
-            return jsonify({'success': False, 'error': 'Failed to reload data'}), 500
+        data = request.get_json(silent=True) or {}
+        initialize_data(from_csv=data.get('source') == 'csv', raise_errors=True)
+        return jsonify({'success': True, 'message': 'Data reloaded successfully'})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Failed to reload data: {e}'}), 500
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -343,28 +683,82 @@ def reload_data():
 # HELPER FUNCTIONS
 # ============================================================================
 
-def save_courses_to_csv():
-    """Save courses to CSV file"""
-    try:
-        with open('Courses.csv', 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['CourseID', 'CourseName', 'Credits', 'Type'])
-            for course in data_loader.courses:
-                writer.writerow([course.course_id, course.name, course.credits, course.type])
+class BatchValidationError(Exception):
+    """Raised inside a batch update to abort it with per-record messages"""
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+# entity -> (id attribute, required fields, record parser)
+BATCH_ENTITIES = {
+    'courses': ('course_id', ['course_id', 'name', 'credits', 'type'], parse_course),
+    'instructors': ('instructor_id', ['instructor_id', 'name', 'role'], parse_instructor),
+    'rooms': ('room_id', ['room_id', 'type', 'capacity'], parse_room),
+    'cohorts': ('cohort_id', ['cohort_id', 'name', 'courses'], parse_cohort),
+}
+
+def check_seconds(name, value):
+    """Error message unless `value` is a positive number"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        return f'{name} must be a positive number of seconds'
+    return None
+
+def check_timeout(timeout, rounds=1):
+    """Error message if `rounds` solves of `timeout` seconds exceed MAX_SOLVE_SECONDS"""
+    error = check_seconds('timeout', timeout)
+    if error:
+        return error
+    if timeout * rounds > MAX_SOLVE_SECONDS:
+        return (f'timeout of {timeout}s x {rounds} round(s) exceeds the server limit of '
+                f'{MAX_SOLVE_SECONDS}s (TIMETABLE_MAX_TIMEOUT)')
+    return None
+
+def check_workers(workers):
+    """Error message unless `workers` is omitted or a positive integer"""
+    if workers is not None and (isinstance(workers, bool) or not isinstance(workers, int) or workers < 1):
+        return 'workers must be a positive integer'
+    return None
+
+def pool_workers(workers):
+    """Pool processes for one solve: as asked, within this process's SOLVE_PROCESSES share"""
+    return min(workers or SOLVE_PROCESSES, SOLVE_PROCESSES)
+
+def claim_job(job_id, key):
+    """Register a request for job_id; False if the job is running for a different request"""
+    with running_jobs_lock:
+        running = running_jobs.get(job_id)
+        if running is not None and running[0] != key:
+            return False
+        running_jobs[job_id] = (key, running[1] + 1 if running else 1)
         return True
-    except Exception as e:
-        print(f"Error saving courses: {e}")
-        return False
+
+def release_job(job_id):
+    with running_jobs_lock:
+        key, count = running_jobs[job_id]
+        if count > 1:
+            running_jobs[job_id] = (key, count - 1)
+        else:
+            del running_jobs[job_id]
+
+def overloaded_response(error):
+    """429 with Retry-After for a request turned away by admission control"""
+    response = jsonify({'success': False, 'error': str(error), 'retry_after': error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+def load_stored_timetable():
+    """Load the timetable selected by ?id= (default: latest) as (result, statistics)"""
+    return storage.get_timetable(request.args.get('id', type=int))
 
 # ============================================================================
 # ERROR HANDLERS
 # ============================================================================
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     return jsonify({'success': False, 'error': 'Resource not found'}), 404
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     return jsonify({'success': False, 'error': 'Internal server error'}), 500
 
@@ -379,6 +773,8 @@ if __name__ == '__main__':
     print("="*80)
     print("\n🚀 Starting Flask server...")
     print("📍 Server will be available at: http://localhost:5000")
+    print("   (development server - use 'gunicorn -c gunicorn.conf.py wsgi:app' in production)")
     print("="*80 + "\n")
     
+    app = create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,87 @@
+# checkpoint.py - Periodic on-disk checkpoints of a running solve
+#
+# A checkpoint holds the best-so-far schedule plus enough search state to
+# pick up where the solver left off:
+#   {"format": 1, "saved_at": ..., "dataset_version": 3,
+#    "state": {"phase": "optimize", "attempt": 0, "temperature": 0.8, ...},
+#    "best": [["CSE014", "S1", "Sunday_8:30 AM", "B18-F1", "INS004"], ...]}
+# Assignments are stored as id tuples - the encoding decomposition already
+# ships between processes - so a checkpoint of a few thousand sessions is a
+# few hundred KB and writing one costs milliseconds.
+#
+# Writes go to a uniquely named temporary file that is then renamed over the
+# checkpoint, so a crash mid-write leaves the previous checkpoint intact and
+# concurrent writers never share a temporary file. A checkpoint records the
+# options of the run that wrote it and is only resumed by a run with the same.
+import json
+import os
+import tempfile
+import time
+
+FORMAT = 1
+
+
+class Checkpointer:
+    """Saves a solver's progress to `path` at most every `interval` seconds"""
+
+    def __init__(self, path, interval=5.0, dataset_version=None, options=None):
+        self.path = path
+        self.interval = interval
+        self.dataset_version = dataset_version
+        self.options = options  # JSON-serializable solve options; load() requires a match
+        self.saves = 0
+        self._last_save = time.monotonic()
+
+    def due(self):
+        return time.monotonic() - self._last_save >= self.interval
+
+    def save(self, encoded, **state):
+        """Write encoded assignments (see EnhancedCSPTimetable.encode_assignments) and search state"""
+        payload = {
+            'format': FORMAT,
+            'saved_at': time.time(),
+            'dataset_version': self.dataset_version,
+            'options': self.options,
+            'state': state,
+            'best': [list(entry) for entry in encoded]
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp',
+                                                 dir=directory)
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.saves += 1
+        self._last_save = time.monotonic()
+
+    def load(self):
+        """Return the saved checkpoint, or None when there is none, it is unreadable or
+        it was written by a run with other options"""
+        payload = load_checkpoint(self.path)
+        if payload is None or payload.get('options') != self.options:
+            return None
+        return payload
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if payload.get('format') != FORMAT:
+        return None
+    return payload
@@ -0,0 +1,163 @@
+# cli.py - Headless timetable generation for cron and batch pipelines
+#
+# Runs the same solver modes as POST /api/generate (generation.solve)
+# without importing Flask:
+#
+#   python cli.py --db timetable.db --mode anneal --seed 1 -o timetable.json
+#   python cli.py --csv-dir data/ --format csv --timeout 120 > timetable.csv
+#
+# The catalogue comes from the SQLite store when it has one (the snapshot the
+# web app edits), otherwise from the CSV files. Solver progress goes to
+# stderr so stdout carries only the export. Exit status is 0 when every
+# session was placed, 2 when some were left unscheduled and 1 on errors.
+#
+# --archive writes a zip with one timetable per instructor and room (see
+# exports.build_archive); with --timetable it exports a stored timetable
+# instead of solving:
+#
+#   python cli.py --timetable latest --archive term.zip --term-start 2026-09-06
+#
+# With --checkpoint the solve saves its progress to that file and a rerun
+# with the same path resumes from it; the file is removed once the export
+# has been written. --warm-start starts from a stored timetable (an id or
+# 'latest'), keeping as much of its layout as the catalogue still allows.
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from checkpoint import Checkpointer
+from constraints import validate_constraint_set
+from dataset import DatasetStore
+from exports import ARCHIVE_FORMATS, build_archive, result_to_json, schedule_to_csv
+from generation import GENERATE_MODES, solve
+from storage import TimetableStorage
+
+CSV_FILES = ('Courses.csv', 'instructors.csv', 'Rooms.csv', 'TimeSlots.csv', 'Cohorts.csv')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Generate a timetable without the web server')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--db', help='SQLite catalogue to load (default: $TIMETABLE_DB or timetable.db, '
+                                     'falling back to the CSV files when it is missing or empty)')
+    source.add_argument('--csv-dir', help='directory holding the catalogue CSV files')
+    parser.add_argument('--mode', choices=GENERATE_MODES, default='greedy')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='solver budget in seconds, including --optimize-seconds')
+    parser.add_argument('--workers', type=int, help='worker processes for --mode decomposed')
+    parser.add_argument('--optimize-seconds', type=float, default=5, help='annealing budget for --mode anneal')
+    parser.add_argument('--constraints', help='comma-separated constraint names (default: all)')
+    parser.add_argument('--parameters', help='JSON object of constraint parameter overrides')
+    parser.add_argument('--format', choices=('json', 'csv'), default='json')
+    parser.add_argument('-o', '--output', default='-', help="output file, '-' for stdout")
+    parser.add_argument('--save', action='store_true', help='also store the result in the database history')
+    parser.add_argument('--checkpoint', help='checkpoint file to save progress to and resume from')
+    parser.add_argument('--checkpoint-interval', type=float, default=5, help='seconds between checkpoints')
+    parser.add_argument('--warm-start', help="start from a stored timetable (an id or 'latest')")
+    parser.add_argument('--timetable', help="export a stored timetable (an id or 'latest') instead of solving")
+    parser.add_argument('--archive', help='also write a zip of per-instructor and per-room timetables')
+    parser.add_argument('--archive-formats', default=','.join(ARCHIVE_FORMATS),
+                        help='comma-separated archive file formats')
+    parser.add_argument('--term-start', type=datetime.date.fromisoformat,
+                        help='first day of term (YYYY-MM-DD) for the iCalendar files (default: today)')
+    parser.add_argument('--weeks', type=int, default=15, help='weeks of term for the iCalendar files')
+    return parser
+
+
+def load_dataset(args):
+    """Return (snapshot, storage or None) for the requested catalogue source"""
+    if args.csv_dir is None:
+        path = args.db or os.environ.get('TIMETABLE_DB', 'timetable.db')
+        if args.db and not os.path.exists(path):
+            raise ValueError(f'Database {path} not found')
+        if os.path.exists(path):
+            storage = TimetableStorage(path)
+            if not storage.is_empty():
+                return DatasetStore(storage).reload(), storage
+            if args.db:
+                raise ValueError(f'Database {path} holds no catalogue')
+    csv_dir = args.csv_dir or '.'
+    paths = [os.path.join(csv_dir, name) for name in CSV_FILES]
+    return DatasetStore().load_csv(*paths), None
+
+
+def load_timetable(storage, timetable, option='--timetable'):
+    """A stored export_to_dict() result by id or 'latest'"""
+    if storage is None:
+        raise ValueError(f'{option} needs a database catalogue (--db)')
+    if timetable != 'latest' and not timetable.isdigit():
+        raise ValueError(f"{option} must be an id or 'latest', not {timetable}")
+    stored = storage.get_timetable(None if timetable == 'latest' else int(timetable))
+    if stored is None:
+        raise ValueError(f'Timetable {timetable} not found')
+    return stored[0]
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start_time = time.time()
+    try:
+        constraints = args.constraints.split(',') if args.constraints else None
+        parameters = json.loads(args.parameters) if args.parameters else None
+        validate_constraint_set(constraints, parameters)
+        if args.checkpoint_interval <= 0:
+            raise ValueError('--checkpoint-interval must be a positive number of seconds')
+        if args.weeks < 1:
+            raise ValueError('--weeks must be at least 1')
+
+        # Everything the solver prints is progress, not output
+        with redirect_stdout(sys.stderr):
+            dataset, storage = load_dataset(args)
+            checkpoint = None
+            if args.timetable:
+                result = load_timetable(storage, args.timetable)
+            else:
+                if args.checkpoint:
+                    checkpoint = Checkpointer(args.checkpoint, interval=args.checkpoint_interval,
+                                              dataset_version=dataset.version)
+                warm_start = None
+                if args.warm_start:
+                    warm_start = load_timetable(storage, args.warm_start, option='--warm-start')
+                solver = solve(dataset, args.mode, args.timeout, seed=args.seed, workers=args.workers,
+                               optimize_seconds=args.optimize_seconds, constraints=constraints,
+                               parameters=parameters, warm_start=warm_start, checkpoint=checkpoint)
+                result = solver.export_to_dict()
+                result['dataset_version'] = dataset.version
+                if solver.warm_start_stats is not None:
+                    result['warm_start'] = solver.warm_start_stats
+                if solver.resume_stats is not None:
+                    result['resumed'] = solver.resume_stats
+                if args.save:
+                    if storage is None:
+                        raise ValueError('--save needs a database catalogue (--db)')
+                    result['timetable_id'] = storage.save_timetable(result, dataset.version,
+                                                                    solver.get_statistics())
+            if args.archive:
+                archive = build_archive(result, args.archive_formats.split(','), term_start=args.term_start,
+                                        weeks=args.weeks)
+                with open(args.archive, 'wb') as f:
+                    f.write(archive)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    text = schedule_to_csv(result['schedule']) if args.format == 'csv' else result_to_json(result)
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+    if checkpoint is not None:
+        checkpoint.discard()
+
+    scheduled, total = result['scheduled_courses'], result['total_courses']
+    print(f"✅ Scheduled {scheduled}/{total} sessions in {time.time() - start_time:.1f}s", file=sys.stderr)
+    return 0 if scheduled == total else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,456 @@
+# constraints.py - Pluggable registry of hard and soft scheduling constraints
+#
+# Each Constraint declares which occupancy indexes it reads. When a solver is
+# created, the active set is compiled: only the indexes some constraint needs
+# are maintained, and every constraint's `build(solver, params)` returns a
+# closure with its indexes and parameters already bound. Hard checks run
+# cheapest/most selective first (by `order`), so most candidates are rejected
+# by a static test before any index is touched.
+#
+# Adding a site-specific rule:
+#
+#   def build_no_friday_labs(solver, params):
+#       def check(variable, course, timeslot, room, instructor):
+#           return not (room.type == "Lab" and timeslot.day == "Friday")
+#       return check
+#
+#   register_constraint(Constraint('no_friday_labs', 'hard', build_no_friday_labs, order=5))
+#
+# and pass its name in the solver's `constraints` list (or add it to
+# DEFAULT_CONSTRAINTS).
+from collections import defaultdict
+
+# Tunable numbers used by the default constraints; override per solve
+DEFAULT_PARAMETERS = {
+    'max_daily_load': 4,                 # classes per instructor per day
+    'early_start_times': ['9:00 AM'],
+    'late_start_times': ['2:15 PM'],
+    'early_slot_penalty': 0.5,
+    'late_slot_penalty': 0.5,
+    'day_balance_weight': 0.5,           # per class already on that day
+    'instructor_balance_weight': 0.3,    # per class the instructor already has
+    'small_room_capacity': 50,           # lecture rooms below this are "small" (enrollment unknown)
+    'small_room_penalty': 1,
+    'room_waste_weight': 0.02,           # per empty seat when enrollment is known
+    'consecutive_bonus': 2,              # reward per adjacent class of the same instructor
+    'same_day_meeting_penalty': 3,       # per other meeting of the session on that day
+    'change_penalty': 5,                 # per session moved away from the warm-start timetable
+}
+
+# Occupancy indexes: name -> key function. Each index counts assignments per key.
+INDEX_KEYS = {
+    'instructor_day': lambda solver, variable, timeslot, room, instructor: (instructor.instructor_id, timeslot.day),
+    'session_day': lambda solver, variable, timeslot, room, instructor: (
+        variable.course_id, variable.session, timeslot.day),
+    'day': lambda solver, variable, timeslot, room, instructor: timeslot.day,
+    'instructor': lambda solver, variable, timeslot, room, instructor: instructor.instructor_id,
+    'instructor_position': lambda solver, variable, timeslot, room, instructor: (
+        instructor.instructor_id, timeslot.day, solver.slot_position(timeslot)),
+}
+
+# Interval indexes: name -> function returning the keys an assignment occupies.
+# Each key maps to a bitmap of the day (one bit per MINUTE_UNIT minutes, see
+# solver.session_mask), so overlap between meetings of any length is a single
+# AND. A session attended by many cohorts occupies each of their bitmaps.
+INTERVAL_INDEX_KEYS = {
+    'room_busy': lambda solver, variable, timeslot, room, instructor: (
+        (room.room_id, timeslot.day),),
+    'instructor_busy': lambda solver, variable, timeslot, room, instructor: (
+        (instructor.instructor_id, timeslot.day),),
+    'group_busy': lambda solver, variable, timeslot, room, instructor: (
+        (variable.course_id, variable.group, timeslot.day),),
+    'cohort_busy': lambda solver, variable, timeslot, room, instructor: [
+        (cohort_id, timeslot.day) for cohort_id in solver.session_cohorts(variable)],
+}
+
+
+# What an index-free hard check may declare it reads (Constraint.scope)
+SCOPE_FACTORS = frozenset(('variable', 'timeslot', 'room', 'instructor'))
+
+
+class Constraint:
+    """A named hard or soft rule
+
+    build(solver, params) returns the compiled function
+    f(variable, course, timeslot, room, instructor): a bool (True = allowed)
+    for hard constraints, or the marginal cost of the assignment for soft ones.
+    `indexes` names the INDEX_KEYS / INTERVAL_INDEX_KEYS entries it reads;
+    `order` sorts hard checks (lower runs first - put cheap, selective checks
+    first). `scope` lists what an index-free hard check reads, out of
+    'variable', 'timeslot', 'room' and 'instructor'; create_domains() uses it
+    to filter the domain factors separately (see FactoredDomain), and caches
+    checks that don't read the variable across variables. Checks without a
+    scope are only enforced when a value is placed. Indexed hard checks
+    declare a scope too, so diagnostics.py can count eliminations per factor.
+    `params` names the DEFAULT_PARAMETERS entries build() reads; solver
+    domains are cached per the parameters their static checks declare, so a
+    constraint must list every parameter it uses.
+    """
+
+    def __init__(self, name, kind, build, indexes=(), order=50, description='', scope=None, params=()):
+        if kind not in ('hard', 'soft'):
+            raise ValueError(f"Constraint kind must be 'hard' or 'soft', got {kind!r}")
+        unknown = set(indexes) - set(INDEX_KEYS) - set(INTERVAL_INDEX_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown index(es) for {name}: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.kind = kind
+        self.build = build
+        self.indexes = tuple(indexes)
+        self.order = order
+        self.description = description
+        self.scope = frozenset(scope) if scope is not None else None
+        if self.scope is not None and not self.scope <= SCOPE_FACTORS:
+            raise ValueError(f"Unknown scope for {name}: {', '.join(sorted(self.scope - SCOPE_FACTORS))}")
+        unknown = set(params) - set(DEFAULT_PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown parameter(s) for {name}: {', '.join(sorted(unknown))}")
+        self.params = tuple(params)
+
+    def __repr__(self):
+        return f"Constraint({self.name}: {self.kind})"
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'indexes': list(self.indexes),
+            'order': self.order,
+            'scope': sorted(self.scope) if self.scope is not None else None,
+            'params': list(self.params),
+            'description': self.description
+        }
+
+
+CONSTRAINTS = {}
+
+
+def register_constraint(constraint):
+    """Add (or replace) a constraint in the registry"""
+    CONSTRAINTS[constraint.name] = constraint
+    return constraint
+
+
+def validate_constraint_set(names=None, parameters=None):
+    """Check constraint names and parameter overrides; raises ValueError
+
+    Returns (names, parameters) with defaults filled in. Callers that fan work
+    out to other processes use this to reject bad input before solving.
+    """
+    if names is not None and (not isinstance(names, (list, tuple)) or
+                              not all(isinstance(name, str) for name in names)):
+        raise ValueError('constraints must be a list of constraint names')
+    names = list(DEFAULT_CONSTRAINTS if names is None else names)
+    unknown = [name for name in names if name not in CONSTRAINTS]
+    if unknown:
+        raise ValueError(f"Unknown constraint(s): {', '.join(map(str, unknown))}")
+    if parameters is not None and not isinstance(parameters, dict):
+        raise ValueError('constraint parameters must be an object')
+    unknown = set(parameters or {}) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown constraint parameter(s): {', '.join(sorted(unknown))}")
+    for name, value in (parameters or {}).items():
+        _check_parameter_type(name, value)
+    return names, dict(DEFAULT_PARAMETERS, **(parameters or {}))
+
+
+def _check_parameter_type(name, value):
+    """An override must have the type of its DEFAULT_PARAMETERS entry"""
+    default = DEFAULT_PARAMETERS[name]
+    if isinstance(default, list):
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"Constraint parameter '{name}' must be a list of strings")
+    elif isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Constraint parameter '{name}' must be a number")
+
+
+class CompiledConstraints:
+    """The active constraint set of one solver, bound to that solver's indexes"""
+
+    def __init__(self, solver, names=None, parameters=None):
+        names, self.parameters = validate_constraint_set(names, parameters)
+        self.names = frozenset(names)
+        active = [CONSTRAINTS[name] for name in names]
+        self.hard = sorted((c for c in active if c.kind == 'hard'), key=lambda c: c.order)
+        self.soft = [c for c in active if c.kind == 'soft']
+
+        # Only maintain the indexes some active constraint reads
+        self.indexes = {name: defaultdict(int)
+                        for name in sorted({i for c in active for i in c.indexes})}
+        self.index_updates = [(INDEX_KEYS[name], index) for name, index in self.indexes.items()
+                              if name in INDEX_KEYS]
+        self.interval_updates = [(INTERVAL_INDEX_KEYS[name], index) for name, index in self.indexes.items()
+                                 if name in INTERVAL_INDEX_KEYS]
+        solver.indexes = self.indexes
+
+        self.hard_checks = tuple(c.build(solver, self.parameters) for c in self.hard)
+        # Hard checks that read no index depend only on the candidate itself;
+        # create_domains() applies them once up front: (scope, check) pairs
+        self.static_checks = tuple((c.scope, check) for c, check in zip(self.hard, self.hard_checks)
+                                   if not c.indexes)
+        # Identifies everything the static checks depend on besides the dataset,
+        # so domains can be cached per dataset version and constraint set; only
+        # the parameters those checks declare count (see Constraint.params)
+        static = [c for c in self.hard if not c.indexes]
+        self.static_key = (tuple(c.name for c in static),
+                           repr(sorted({p: self.parameters[p] for c in static for p in c.params}.items())))
+        self.soft_terms = tuple(c.build(solver, self.parameters) for c in self.soft)
+
+    def reset(self):
+        """Empty every index in place (compiled closures keep their references)"""
+        for index in self.indexes.values():
+            index.clear()
+
+
+# ============================================================================
+# DEFAULT HARD CONSTRAINTS
+# ============================================================================
+
+def build_room_type(solver, params):
+    def check(variable, course, timeslot, room, instructor):
+        return room.type == solver.required_room_type(variable, course)
+    return check
+
+
+def build_fits_in_day(solver, params):
+    def check(variable, course, timeslot, room, instructor):
+        # Long meetings must end before the day's last timeslot does
+        return solver.session_interval(variable, timeslot)[1] <= solver.day_end(timeslot.day)
+    return check
+
+
+def build_room_fits(solver, params):
+    def check(variable, course, timeslot, room, instructor):
+        # Unknown enrollment (0) fits anywhere
+        return room.capacity >= course.enrollment
+    return check
+
+
+def build_instructor_availability(solver, params):
+    # Parse each "Not on <Day>" once instead of on every check
+    unavailable = {i.instructor_id: i.unavailable_day.replace("Not on", "").strip().lower()
+                   for i in solver.instructors}
+
+    def check(variable, course, timeslot, room, instructor):
+        return timeslot.day.lower() != unavailable.get(instructor.instructor_id, '')
+    return check
+
+
+def build_instructor_qualified(solver, params):
+    qualified = {(i.instructor_id, course_id)
+                 for i in solver.instructors for course_id in i.qualified_courses}
+
+    def check(variable, course, timeslot, room, instructor):
+        return (instructor.instructor_id, variable.course_id) in qualified
+    return check
+
+
+def build_room_free(solver, params):
+    room_busy = solver.indexes['room_busy']
+
+    def check(variable, course, timeslot, room, instructor):
+        return not room_busy.get((room.room_id, timeslot.day), 0) & solver.session_mask(variable, timeslot)
+    return check
+
+
+def build_instructor_free(solver, params):
+    instructor_busy = solver.indexes['instructor_busy']
+
+    def check(variable, course, timeslot, room, instructor):
+        return not (instructor_busy.get((instructor.instructor_id, timeslot.day), 0) &
+                    solver.session_mask(variable, timeslot))
+    return check
+
+
+def build_instructor_daily_load(solver, params):
+    instructor_day = solver.indexes['instructor_day']
+    max_daily_load = params['max_daily_load']
+
+    def check(variable, course, timeslot, room, instructor):
+        return instructor_day.get((instructor.instructor_id, timeslot.day), 0) < max_daily_load
+    return check
+
+
+def build_course_sections_apart(solver, params):
+    group_busy = solver.indexes['group_busy']
+
+    def check(variable, course, timeslot, room, instructor):
+        # Other meetings (LECTURE vs LAB, or repeats) of the same section group overlapping
+        return not (group_busy.get((variable.course_id, variable.group, timeslot.day), 0) &
+                    solver.session_mask(variable, timeslot))
+    return check
+
+
+def build_cohort_free(solver, params):
+    cohort_busy = solver.indexes['cohort_busy']
+
+    def check(variable, course, timeslot, room, instructor):
+        # Every cohort attending this session must be free for its whole length
+        cohorts = solver.session_cohorts(variable)
+        if not cohorts:
+            return True
+        mask = solver.session_mask(variable, timeslot)
+        for cohort_id in cohorts:
+            if cohort_busy.get((cohort_id, timeslot.day), 0) & mask:
+                return False
+        return True
+    return check
+
+
+# ============================================================================
+# DEFAULT SOFT CONSTRAINTS (marginal cost of adding one assignment)
+# ============================================================================
+
+def build_early_late_slots(solver, params):
+    early = set(params['early_start_times'])
+    late = set(params['late_start_times'])
+    early_penalty = params['early_slot_penalty']
+    late_penalty = params['late_slot_penalty']
+
+    def cost(variable, course, timeslot, room, instructor):
+        if timeslot.start_time in early:
+            return early_penalty
+        if timeslot.start_time in late:
+            return late_penalty
+        return 0
+    return cost
+
+
+def build_day_balance(solver, params):
+    day = solver.indexes['day']
+    weight = params['day_balance_weight']
+
+    def cost(variable, course, timeslot, room, instructor):
+        return day.get(timeslot.day, 0) * weight
+    return cost
+
+
+def build_instructor_balance(solver, params):
+    by_instructor = solver.indexes['instructor']
+    weight = params['instructor_balance_weight']
+
+    def cost(variable, course, timeslot, room, instructor):
+        return by_instructor.get(instructor.instructor_id, 0) * weight
+    return cost
+
+
+def build_small_lecture_room(solver, params):
+    threshold = params['small_room_capacity']
+    penalty = params['small_room_penalty']
+
+    def cost(variable, course, timeslot, room, instructor):
+        # Only a guess for courses without an enrollment; room_waste covers the rest
+        if not course.enrollment and "Lab" not in course.type and room.capacity < threshold:
+            return penalty
+        return 0
+    return cost
+
+
+def build_room_waste(solver, params):
+    weight = params['room_waste_weight']
+
+    def cost(variable, course, timeslot, room, instructor):
+        if not course.enrollment:
+            return 0
+        return max(room.capacity - course.enrollment, 0) * weight
+    return cost
+
+
+def build_spread_meetings(solver, params):
+    session_day = solver.indexes['session_day']
+    penalty = params['same_day_meeting_penalty']
+
+    def cost(variable, course, timeslot, room, instructor):
+        # Repeated meetings of one session should fall on different days
+        return session_day.get((variable.course_id, variable.session, timeslot.day), 0) * penalty
+    return cost
+
+
+def build_stability(solver, params):
+    previous = solver.previous_assignments
+    penalty = params['change_penalty']
+
+    def cost(variable, course, timeslot, room, instructor):
+        # Only sessions that were in the warm-start timetable can "move"
+        placed = previous.get((variable.course_id, variable.section_id))
+        if placed is None or placed == (timeslot.id, room.room_id, instructor.instructor_id):
+            return 0
+        return penalty
+    return cost
+
+
+def build_consecutive_slots(solver, params):
+    positions = solver.indexes['instructor_position']
+    bonus = params['consecutive_bonus']
+
+    def cost(variable, course, timeslot, room, instructor):
+        position = solver.slot_position(timeslot)
+        if position is None:
+            return 0
+        instructor_id = instructor.instructor_id
+        return -bonus * ((positions.get((instructor_id, timeslot.day, position - 1), 0) > 0) +
+                         (positions.get((instructor_id, timeslot.day, position + 1), 0) > 0))
+    return cost
+
+
+register_constraint(Constraint('room_type', 'hard', build_room_type, order=10, scope=('variable', 'room'),
+                               description='Room type matches the session (Lecture hall / Lab)'))
+register_constraint(Constraint('fits_in_day', 'hard', build_fits_in_day, order=5,
+                               scope=('variable', 'timeslot'),
+                               description="Long meetings end within the day's timeslots"))
+register_constraint(Constraint('room_fits', 'hard', build_room_fits, order=15, scope=('variable', 'room'),
+                               description='Room capacity covers the expected enrollment'))
+register_constraint(Constraint('instructor_availability', 'hard', build_instructor_availability, order=20,
+                               scope=('timeslot', 'instructor'),
+                               description="Instructor is not scheduled on their unavailable day"))
+register_constraint(Constraint('instructor_qualified', 'hard', build_instructor_qualified, order=30,
+                               scope=('variable', 'instructor'),
+                               description='Instructor is qualified for the course'))
+register_constraint(Constraint('room_free', 'hard', build_room_free, indexes=('room_busy',), order=40,
+                               scope=('variable', 'timeslot', 'room'),
+                               description='No room double-booking'))
+register_constraint(Constraint('instructor_free', 'hard', build_instructor_free,
+                               indexes=('instructor_busy',), order=50,
+                               scope=('variable', 'timeslot', 'instructor'),
+                               description='No instructor double-booking'))
+register_constraint(Constraint('instructor_daily_load', 'hard', build_instructor_daily_load,
+                               indexes=('instructor_day',), order=60, scope=('timeslot', 'instructor'),
+                               params=('max_daily_load',),
+                               description='At most max_daily_load classes per instructor per day'))
+register_constraint(Constraint('course_sections_apart', 'hard', build_course_sections_apart,
+                               indexes=('group_busy',), order=70, scope=('variable', 'timeslot'),
+                               description='Meetings of a section group (Lecture, Lab, repeats) never overlap'))
+register_constraint(Constraint('cohort_free', 'hard', build_cohort_free,
+                               indexes=('cohort_busy',), order=75, scope=('variable', 'timeslot'),
+                               description='No overlapping sessions for a student cohort'))
+
+register_constraint(Constraint('early_late_slots', 'soft', build_early_late_slots,
+                               params=('early_start_times', 'late_start_times',
+                                       'early_slot_penalty', 'late_slot_penalty'),
+                               description='Light penalty for the first and last slot of the day'))
+register_constraint(Constraint('day_balance', 'soft', build_day_balance, indexes=('day',),
+                               params=('day_balance_weight',),
+                               description='Spread classes evenly over the week'))
+register_constraint(Constraint('instructor_balance', 'soft', build_instructor_balance,
+                               indexes=('instructor',), params=('instructor_balance_weight',),
+                               description='Prefer instructors with fewer classes'))
+register_constraint(Constraint('small_lecture_room', 'soft', build_small_lecture_room,
+                               params=('small_room_capacity', 'small_room_penalty'),
+                               description='Prefer larger rooms for lecture courses of unknown size'))
+register_constraint(Constraint('room_waste', 'soft', build_room_waste, params=('room_waste_weight',),
+                               description='Prefer the smallest room that fits (fewer empty seats)'))
+register_constraint(Constraint('spread_meetings', 'soft', build_spread_meetings, indexes=('session_day',),
+                               params=('same_day_meeting_penalty',),
+                               description='Spread repeated meetings of a session over different days'))
+register_constraint(Constraint('stability', 'soft', build_stability, params=('change_penalty',),
+                               description='Keep sessions where the warm-start timetable had them'))
+register_constraint(Constraint('consecutive_slots', 'soft', build_consecutive_slots,
+                               indexes=('instructor_position',), params=('consecutive_bonus',),
+                               description="Reward back-to-back classes (fewer instructor gaps)"))
+
+DEFAULT_CONSTRAINTS = [
+    'fits_in_day', 'room_type', 'room_fits', 'instructor_availability', 'instructor_qualified', 'room_free',
+    'instructor_free', 'instructor_daily_load', 'course_sections_apart', 'cohort_free',
+    'early_late_slots', 'day_balance', 'instructor_balance', 'small_lecture_room',
+    'room_waste', 'spread_meetings', 'stability', 'consecutive_slots',
+]
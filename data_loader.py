@@ -1,6 +1,7 @@
 # data_loader.py (using built-in csv module - NO PANDAS)
 import csv
-from enhanced_csp_model import Course, Instructor, Room, Timeslot
+import os
+from enhanced_csp_model import Cohort, Course, Instructor, Room, Timeslot
 
 class DataLoader:
     def __init__(self):
@@ -8,66 +9,90 @@ class DataLoader:
         self.instructors = []
         self.rooms = []
         self.timeslots = []
+        self.cohorts = []
 
-    def load_all_data(self, courses_path, instructors_path, rooms_path, timeslots_path):
-        """Loads all data from the provided CSV file paths using built-in csv module."""
+    def load_all_data(self, courses_path, instructors_path, rooms_path, timeslots_path, cohorts_path=None,
+                      strict=False):
+        """Loads all data from the provided CSV file paths using built-in csv module.
+
+        The cohorts file is optional: it is skipped if not given or missing.
+        With strict=True a missing file or malformed row raises ValueError
+        (naming the file and line) instead of being reported and skipped.
+        """
         try:
             # Clear existing data before reloading
             self.courses = []
             self.instructors = []
             self.rooms = []
             self.timeslots = []
+            self.cohorts = []
             
             # Load Courses
-            with open(courses_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    self.courses.append(Course(
-                        row['CourseID'], 
-                        row['CourseName'], 
-                        row['Credits'], 
-                        row['Type']
-                    ))
+            self._load_rows(courses_path, self.courses, lambda row: Course(
+                row['CourseID'], 
+                row['CourseName'], 
+                row['Credits'], 
+                row['Type'],
+                int(row.get('Enrollment') or 0),      # Optional column
+                int(row.get('Sections') or 1),        # Optional column
+                float(row.get('Hours') or 0),         # Optional column
+                int(row.get('SessionMinutes') or 0)   # Optional column
+            ))
             
             # Load Instructors
-            with open(instructors_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    self.instructors.append(Instructor(
-                        row['InstructorID'],
-                        row['Name'],
-                        row['Role'],
-                        row['PreferredSlots'],
-                        row['QualifiedCourses']
-                    ))
+            self._load_rows(instructors_path, self.instructors, lambda row: Instructor(
+                row['InstructorID'],
+                row['Name'],
+                row['Role'],
+                row['PreferredSlots'],
+                row['QualifiedCourses']
+            ))
             
             # Load Rooms
-            with open(rooms_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    self.rooms.append(Room(
-                        row['RoomID'],
-                        row['Type'],
-                        int(row['Capacity'])
-                    ))
+            self._load_rows(rooms_path, self.rooms, lambda row: Room(
+                row['RoomID'],
+                row['Type'],
+                int(row['Capacity'])
+            ))
             
             # Load Timeslots
-            with open(timeslots_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    self.timeslots.append(Timeslot(
-                        row['Day'],
-                        row['StartTime'],
-                        row['EndTime']
-                    ))
+            self._load_rows(timeslots_path, self.timeslots, lambda row: Timeslot(
+                row['Day'],
+                row['StartTime'],
+                row['EndTime']
+            ))
+            
+            # Load Cohorts (optional)
+            if cohorts_path and os.path.exists(cohorts_path):
+                self._load_rows(cohorts_path, self.cohorts, lambda row: Cohort(
+                    row['CohortID'],
+                    row['Name'],
+                    row['Courses']
+                ))
             
             print("All data loaded successfully using CSV module!")
             print(f"Loaded {len(self.courses)} courses, {len(self.instructors)} instructors, {len(self.rooms)} rooms, {len(self.timeslots)} timeslots")
             
         except FileNotFoundError as e:
             print(f"Error loading data: {e}")
+            if strict:
+                raise ValueError(f"Missing data file: {e.filename}") from e
         except Exception as e:
             print(f"Unexpected error: {e}")
+            if strict:
+                raise ValueError(str(e)) from e
+
+    @staticmethod
+    def _load_rows(path, target, parse):
+        """Append parse(row) for every CSV row; errors name the file and line"""
+        with open(path, 'r', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                try:
+                    target.append(parse(row))
+                except (KeyError, ValueError, TypeError) as e:
+                    detail = f"missing column {e}" if isinstance(e, KeyError) else str(e)
+                    raise ValueError(f"{os.path.basename(path)} line {reader.line_num}: {detail}") from e
 
     def get_courses(self):
         return self.courses
@@ -81,6 +106,9 @@ class DataLoader:
     def get_timeslots(self):
         return self.timeslots
 
+    def get_cohorts(self):
+        return self.cohorts
+
 # Test the data loader
 if __name__ == "__main__":
     loader = DataLoader()
@@ -0,0 +1,231 @@
+# dataset.py - Versioned, immutable dataset snapshots
+#
+# Readers (API requests, solver runs) grab the current snapshot once and work
+# on it for their whole lifetime; writers build a new snapshot and publish it
+# by swapping a single reference. Replacing an attribute is atomic in CPython,
+# so readers never lock and never see a half-updated catalogue.
+#
+# When backed by a TimetableStorage, snapshot versions are the storage's
+# catalogue_version, so a process notices edits made by other workers and
+# reloads instead of serving a stale catalogue.
+import threading
+from data_loader import DataLoader
+from enhanced_csp_model import Cohort, Course, Instructor, Room, Timeslot
+
+
+class DatasetSnapshot:
+    """Immutable view of courses, instructors, rooms, timeslots and cohorts at one version"""
+
+    def __init__(self, version, courses, instructors, rooms, timeslots, cohorts=()):
+        self.version = version
+        self.courses = tuple(courses)
+        self.instructors = tuple(instructors)
+        self.rooms = tuple(rooms)
+        self.timeslots = tuple(timeslots)
+        self.cohorts = tuple(cohorts)
+        self._courses_by_id = {c.course_id: c for c in self.courses}
+        self._instructors_by_id = {i.instructor_id: i for i in self.instructors}
+        self._rooms_by_id = {r.room_id: r for r in self.rooms}
+        self._cohorts_by_id = {c.cohort_id: c for c in self.cohorts}
+        # Static solver domains for this version, filled by solvers given
+        # domain_cache=snapshot.domain_cache; a new version starts empty
+        self.domain_cache = {}
+
+    def __repr__(self):
+        return (f"DatasetSnapshot(v{self.version}: {len(self.courses)} courses, "
+                f"{len(self.instructors)} instructors, {len(self.rooms)} rooms, "
+                f"{len(self.timeslots)} timeslots, {len(self.cohorts)} cohorts)")
+
+    def get_courses(self):
+        return self.courses
+
+    def get_instructors(self):
+        return self.instructors
+
+    def get_rooms(self):
+        return self.rooms
+
+    def get_timeslots(self):
+        return self.timeslots
+
+    def get_cohorts(self):
+        return self.cohorts
+
+    def get_course(self, course_id):
+        return self._courses_by_id.get(course_id)
+
+    def get_instructor(self, instructor_id):
+        return self._instructors_by_id.get(instructor_id)
+
+    def get_room(self, room_id):
+        return self._rooms_by_id.get(room_id)
+
+    def get_cohort(self, cohort_id):
+        return self._cohorts_by_id.get(cohort_id)
+
+    def replace(self, version, **changes):
+        """Return a new snapshot with some collections replaced"""
+        return DatasetSnapshot(
+            version,
+            changes.get('courses', self.courses),
+            changes.get('instructors', self.instructors),
+            changes.get('rooms', self.rooms),
+            changes.get('timeslots', self.timeslots),
+            changes.get('cohorts', self.cohorts)
+        )
+
+
+def parse_course(record):
+    """Build a Course from a JSON record (API / scenario input); raises ValueError on bad numbers"""
+    try:
+        enrollment = int(record.get('enrollment') or 0)
+        sections = int(record.get('sections') or 1)
+        session_minutes = int(record.get('session_minutes') or 0)
+        hours = float(record.get('hours') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('enrollment, sections, hours and session_minutes must be numbers')
+    if enrollment < 0:
+        raise ValueError('enrollment must not be negative')
+    if sections < 1:
+        raise ValueError('sections must be at least 1')
+    if hours < 0 or session_minutes < 0:
+        raise ValueError('hours and session_minutes must not be negative')
+    return Course(str(record['course_id']), record['name'], str(record['credits']), record['type'],
+                  enrollment, sections, hours, session_minutes)
+
+def parse_instructor(record):
+    """Build an Instructor from a JSON record; raises ValueError on bad day/course fields"""
+    # Accept either the stored 'unavailable_day' or the CSV-style 'preferred_slots'
+    unavailable_day = record.get('unavailable_day', record.get('preferred_slots', ''))
+    if not isinstance(unavailable_day, str):
+        raise ValueError('unavailable_day must be a string')
+    qualified_courses = record.get('qualified_courses', [])
+    if not (isinstance(qualified_courses, str) or
+            isinstance(qualified_courses, list) and all(isinstance(c, str) for c in qualified_courses)):
+        raise ValueError('qualified_courses must be a list of course ids or a comma-separated string')
+    return Instructor(str(record['instructor_id']), record['name'], record['role'],
+                      unavailable_day, record.get('qualified_courses', []))
+
+def parse_room(record):
+    """Build a Room from a JSON record; raises ValueError on bad type/capacity"""
+    if record['type'] not in ('Lecture', 'Lab'):
+        raise ValueError("type must be 'Lecture' or 'Lab'")
+    try:
+        capacity = int(record['capacity'])
+    except (TypeError, ValueError):
+        raise ValueError('capacity must be an integer')
+    if capacity <= 0:
+        raise ValueError('capacity must be positive')
+    return Room(str(record['room_id']), record['type'], capacity)
+
+def parse_cohort(record):
+    """Build a Cohort from a JSON record; raises ValueError on bad course references"""
+    courses = record.get('courses', [])
+    if not (isinstance(courses, str) or
+            isinstance(courses, list) and all(isinstance(c, str) for c in courses)):
+        raise ValueError('courses must be a list of course ids or a comma-separated string')
+    return Cohort(str(record['cohort_id']), record['name'], courses)
+
+def parse_timeslot(record):
+    """Build a Timeslot from a JSON record; raises ValueError on malformed times"""
+    return Timeslot(record['day'], record['start_time'], record['end_time'])
+
+
+def merge_collection(items, key, upserts=(), deletes=()):
+    """Apply upserts and deletes to a collection keyed by attribute `key`
+
+    Replaced items keep their position and new items are appended, matching
+    the row order of the persistent store. Runs in one linear pass.
+    """
+    deleted = set(deletes)
+    replacements = {getattr(item, key): item for item in upserts}
+    merged = []
+    for item in items:
+        item_id = getattr(item, key)
+        if item_id in deleted:
+            continue
+        merged.append(replacements.pop(item_id, item))
+    merged.extend(replacements.values())
+    return tuple(merged)
+
+
+class DatasetStore:
+    """Holds the current snapshot and publishes new versions atomically
+
+    Only writers take the lock, and only to serialize read-modify-write
+    updates against each other. Readers call current() and never block.
+    """
+
+    def __init__(self, storage=None):
+        self._snapshot = DatasetSnapshot(0, (), (), (), ())
+        self._write_lock = threading.Lock()
+        self._storage = storage
+
+    def current(self):
+        """Return the latest published snapshot (pin it for the whole request)"""
+        snapshot = self._snapshot
+        if self._storage is not None and self._storage.catalogue_version() != snapshot.version:
+            # Another process changed the catalogue since we last looked
+            snapshot = self.reload()
+        return snapshot
+
+    def reload(self):
+        """Re-read the whole catalogue from storage and publish it"""
+        with self._write_lock:
+            return self._reload()
+
+    def publish(self, **changes):
+        """Publish a new version with the given collections replaced"""
+        with self._write_lock:
+            return self._publish(changes)
+
+    def update(self, mutator):
+        """Apply mutator(snapshot) -> dict of changed collections, atomically
+
+        The mutator sees the latest snapshot and may raise to abort the update,
+        in which case nothing is published. A mutator that wrote to storage
+        returns the storage's new catalogue version under the 'version' key.
+        """
+        with self._write_lock:
+            changes = mutator(self._snapshot)
+            return self._publish(changes or {})
+
+    def load_csv(self, courses_path, instructors_path, rooms_path, timeslots_path, cohorts_path=None):
+        """Parse the CSV files into a fresh loader and publish them as one version
+
+        With storage attached the CSVs replace the stored catalogue, so any
+        unreadable file or row raises ValueError and nothing is published or
+        written; neither is an empty course, instructor, room or timeslot list.
+        """
+        loader = DataLoader()
+        loader.load_all_data(courses_path, instructors_path, rooms_path, timeslots_path, cohorts_path,
+                             strict=True)
+        catalogue = {
+            'courses': loader.get_courses(),
+            'instructors': loader.get_instructors(),
+            'rooms': loader.get_rooms(),
+            'timeslots': loader.get_timeslots(),
+            'cohorts': loader.get_cohorts()
+        }
+        empty = [name for name in ('courses', 'instructors', 'rooms', 'timeslots') if not catalogue[name]]
+        if empty:
+            raise ValueError(f"CSV catalogue has no {', '.join(empty)}; refusing to replace the current one")
+        with self._write_lock:
+            if self._storage is not None:
+                catalogue['version'] = self._storage.import_catalogue(**catalogue)
+            return self._publish(catalogue)
+
+    def _publish(self, changes):
+        base = self._snapshot
+        version = changes.pop('version', base.version + 1)
+        if self._storage is not None and version != base.version + 1:
+            # Storage moved on more than our own write: base is stale
+            return self._reload()
+        snapshot = base.replace(version, **changes)
+        self._snapshot = snapshot
+        return snapshot
+
+    def _reload(self):
+        version, courses, instructors, rooms, timeslots, cohorts = self._storage.load_catalogue()
+        self._snapshot = DatasetSnapshot(version, courses, instructors, rooms, timeslots, cohorts)
+        return self._snapshot
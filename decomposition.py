@@ -0,0 +1,182 @@
+# decomposition.py - Split the timetabling problem into independent subproblems
+#
+# Two sessions interact only through a shared resource: an instructor that
+# could teach both, a room, a student cohort attending both, or (for Lecture
+# and Lab courses) the course itself. Instructors mostly qualify for courses of their own programme, so
+# the graph "sessions linked through instructors/courses" falls apart into
+# many connected components that are coupled only through the room pool.
+#
+# solve_decomposed():
+#   1. builds that graph from create_domains() output and finds components
+#   2. packs components into one bucket per worker (largest first)
+#   3. splits the rooms of each type between buckets in proportion to demand,
+#      so buckets share no resource at all and can be solved in parallel
+#   4. merges the results - feasible by construction - and runs one greedy
+#      repair pass over the full room pool for anything left unscheduled
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from enhanced_csp_model import EnhancedCSPTimetable
+
+
+def find_components(solver):
+    """Group the solver's variables into components of the instructor/course graph
+
+    Requires solver.create_variables() and solver.create_domains() to have run.
+    Returns a list of variable lists, largest first.
+    """
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(a, b):
+        parent[find(a)] = find(b)
+
+    for variable in solver.variables:
+        # Sections of one course always belong together
+        union(('var', variable), ('course', variable.course_id))
+        for cohort_id in solver.session_cohorts(variable):
+            union(('var', variable), ('cohort', cohort_id))
+        domain = solver.domains.get(variable)
+        for instructor in domain.instructors if domain else ():
+            union(('var', variable), ('instructor', instructor.instructor_id))
+
+    components = defaultdict(list)
+    for variable in solver.variables:
+        components[find(('var', variable))].append(variable)
+    return sorted(components.values(), key=len, reverse=True)
+
+
+def pack_components(components, bucket_count):
+    """Largest-first packing of components into at most bucket_count buckets"""
+    buckets = [[] for _ in range(min(bucket_count, len(components)))]
+    for component in components:
+        min(buckets, key=len).extend(component)
+    return [bucket for bucket in buckets if bucket]
+
+
+def split_rooms(buckets, rooms, room_type_of):
+    """Give each bucket its own rooms, per room type, in proportion to demand
+
+    Buckets with demand for a type get at least one room of it when there are
+    enough rooms to go round. Rooms are dealt largest-capacity first so every
+    bucket gets a mix of sizes. Returns one room list per bucket.
+    """
+    allocation = [[] for _ in buckets]
+    rooms_by_type = defaultdict(list)
+    for room in rooms:
+        rooms_by_type[room.type].append(room)
+
+    for room_type, typed_rooms in rooms_by_type.items():
+        demand = [sum(1 for v in bucket if room_type_of(v) == room_type) for bucket in buckets]
+        total = sum(demand)
+        if total == 0:
+            continue
+        typed_rooms = sorted(typed_rooms, key=lambda r: r.capacity, reverse=True)
+
+        # Largest-remainder quotas, at least one room per bucket that needs the type
+        shares = [len(typed_rooms) * d / total for d in demand]
+        quotas = [max(1, int(share)) if d else 0 for share, d in zip(shares, demand)]
+        while sum(quotas) > len(typed_rooms):
+            largest = max(range(len(quotas)), key=lambda i: quotas[i])
+            quotas[largest] -= 1
+        by_remainder = sorted(range(len(buckets)), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+        i = 0
+        while sum(quotas) < len(typed_rooms):
+            if demand[by_remainder[i % len(buckets)]]:
+                quotas[by_remainder[i % len(buckets)]] += 1
+            i += 1
+
+        # Deal rooms round-robin among buckets that still have quota left
+        remaining = list(quotas)
+        position = 0
+        for room in typed_rooms:
+            while remaining[position % len(buckets)] == 0:
+                position += 1
+            allocation[position % len(buckets)].append(room)
+            remaining[position % len(buckets)] -= 1
+            position += 1
+
+    return allocation
+
+
+def solve_decomposed(courses, instructors, rooms, timeslots, timeout_seconds=60, workers=None, seed=None,
+                     constraints=None, parameters=None, cohorts=None, domain_cache=None):
+    """Solve independent subproblems in parallel and merge them
+
+    Returns a solved EnhancedCSPTimetable over the full problem, so callers can
+    export it exactly like the result of solve_enhanced(). `constraints` and
+    `parameters` select the active constraint set (see constraints.py);
+    `domain_cache` is passed to the full-problem solver only, since
+    subproblems see a subset of the rooms.
+    """
+    start_time = time.time()
+    solver = EnhancedCSPTimetable(courses, instructors, rooms, timeslots, constraints, parameters, cohorts,
+                                  domain_cache)
+    solver.create_variables()
+    solver.create_domains()
+
+    components = find_components(solver)
+    # One process per core at most: more only contend for the same CPUs
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, cores))
+    buckets = pack_components(components, workers)
+    print(f"\n🧩 Decomposition: {len(components)} components "
+          f"(largest {len(components[0]) if components else 0} sessions) -> {len(buckets)} subproblems")
+
+    courses_by_id = {c.course_id: c for c in courses}
+    room_allocation = split_rooms(buckets, rooms, lambda v: solver.required_room_type(v, courses_by_id[v.course_id]))
+
+    tasks = []
+    for index, (bucket, bucket_rooms) in enumerate(zip(buckets, room_allocation)):
+        course_ids = {v.course_id for v in bucket}
+        bucket_instructors = {instructor.instructor_id
+                              for v in bucket if solver.domains.get(v)
+                              for instructor in solver.domains[v].instructors}
+        tasks.append((
+            [c for c in courses if c.course_id in course_ids],
+            [i for i in instructors if i.instructor_id in bucket_instructors],
+            bucket_rooms,
+            list(timeslots),
+            [c for c in cohorts or () if any(course_id in course_ids for course_id, _ in c.sessions)],
+            timeout_seconds,
+            None if seed is None else seed + index,
+            constraints,
+            parameters
+        ))
+
+    if len(tasks) <= 1 or workers == 1:
+        results = [_solve_subproblem(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_solve_subproblem, tasks))
+
+    # Merge: subproblems share no instructor, course or room, so the union is feasible
+    solver.clear_assignments()
+    for encoded in results:
+        solver.restore_encoded(encoded)
+
+    merged = len(solver.assignments)
+    if merged < len(solver.variables):
+        # Repair: place leftovers anywhere in the full room pool
+        solver._greedy_schedule()
+    print(f"   Merged {merged} sessions, repair pass placed {len(solver.assignments) - merged} more "
+          f"({time.time() - start_time:.2f}s total)")
+    return solver
+
+
+def _solve_subproblem(task):
+    courses, instructors, rooms, timeslots, cohorts, timeout_seconds, seed, constraints, parameters = task
+    if seed is not None:
+        random.seed(seed)
+    solver = EnhancedCSPTimetable(courses, instructors, rooms, timeslots, constraints, parameters, cohorts)
+    solver.solve_enhanced(timeout_seconds=timeout_seconds)
+    # Send back ids only; the parent maps them onto its own objects
+    return solver.encode_assignments()
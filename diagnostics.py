@@ -0,0 +1,211 @@
+# diagnostics.py - Explain why sessions were left unscheduled
+#
+# For every unscheduled session the domain values (timeslot, room,
+# instructor) are re-checked against the compiled hard constraints, which
+# read the solver's occupancy indexes.
+#
+# The domain is never walked value by value. Each hard constraint declares
+# the factors it reads (Constraint.scope), so checks run once per timeslot,
+# once per (timeslot, room) and once per (timeslot, instructor). Rooms that
+# fail the same checks at a timeslot are counted together, so the cost per
+# session is O(timeslots x (rooms + instructors)), not the size of the
+# domain. Checks without such a scope are evaluated per value on at most
+# MAX_PAIR_VALUES values, and the session is then marked 'sampled'.
+#
+# Per session it reports:
+#   - the initial domain size (after the static pre-filter)
+#   - eliminated_by: which hard constraint rejects each value first
+#   - blocked_only_by: values rejected only because of one resource (a room,
+#     the instructor, ...); one more of that resource makes the session feasible
+#   - a suggestion: the smallest resource addition that unlocks the most values
+from collections import Counter
+
+# hard constraint -> the resource it guards; other constraints stand for themselves
+RESOURCES = {
+    'room_free': 'room',
+    'instructor_free': 'instructor',
+    'instructor_daily_load': 'instructor',
+    'course_sections_apart': 'section',
+    'cohort_free': 'cohort',
+}
+
+# resource -> (action, suggestion template); {type}, {seats}, {course}, {slot},
+# {instructor}, {cohorts} and {name} are filled in per session
+SUGGESTIONS = {
+    'room': ('add_room', 'Add a {type} room with at least {seats} seats (all are busy at {slot})'),
+    'instructor': ('add_instructor', 'Qualify another instructor for {course} '
+                                     '({instructor} is busy or at max_daily_load at {slot})'),
+    'section': ('add_timeslot', 'Add a timeslot: the other meetings of this section fill the free ones'),
+    'cohort': ('split_cohort', 'Cohort(s) {cohorts} are busy at {slot}: add a section or a timeslot'),
+}
+
+
+# Values checked one by one per session for constraints whose scope covers
+# both the room and the instructor, or is not declared
+MAX_PAIR_VALUES = 2000
+
+# Index-free checks with these scopes were applied by create_domains() when it
+# built the FactoredDomain, so every value of such a domain passes them
+DOMAIN_FILTERED_SCOPES = tuple(frozenset(scope) for scope in (
+    ('variable', 'timeslot'), ('variable', 'room'), ('variable', 'instructor'),
+    ('variable', 'timeslot', 'instructor'), ('timeslot', 'instructor')))
+
+SLOT_SCOPE = frozenset(('variable', 'timeslot'))
+ROOM_SCOPE = frozenset(('variable', 'timeslot', 'room'))
+INSTRUCTOR_SCOPE = frozenset(('variable', 'timeslot', 'instructor'))
+
+
+def explain_unscheduled(solver):
+    """Diagnose every unscheduled variable of a solved EnhancedCSPTimetable"""
+    compiled = solver.compiled_constraints
+    names = [c.name for c in compiled.hard]
+    # Check positions (= hard order) by the factors they read
+    groups = {'slot': [], 'room': [], 'instructor': [], 'pair': []}
+    for position, constraint in enumerate(compiled.hard):
+        scope = constraint.scope
+        if not constraint.indexes and any(scope is not None and scope <= s for s in DOMAIN_FILTERED_SCOPES):
+            continue
+        if scope is not None and scope <= SLOT_SCOPE:
+            groups['slot'].append(position)
+        elif scope is not None and scope <= ROOM_SCOPE:
+            groups['room'].append(position)
+        elif scope is not None and scope <= INSTRUCTOR_SCOPE:
+            groups['instructor'].append(position)
+        else:
+            groups['pair'].append(position)
+    checks = compiled.hard_checks
+    sessions = []
+    eliminated_total = Counter()
+    actions = Counter()
+
+    for variable in solver.variables:
+        if variable in solver.assignments:
+            continue
+        course = solver._courses_by_id.get(variable.course_id)
+        domain = solver.domains.get(variable, [])
+        eliminated_by = Counter()
+        blocked_only_by = Counter()
+        example = {}  # resource -> first value it alone blocks
+        sampled = False
+
+        def record(failed, count, value):
+            eliminated_by[names[failed[0]]] += count
+            resources = {RESOURCES.get(names[k], names[k]) for k in failed}
+            if len(resources) == 1:
+                resource = resources.pop()
+                blocked_only_by[resource] += count
+                example.setdefault(resource, value)
+
+        if not domain:
+            # Nothing survived the static checks (e.g. no room fits): there are
+            # no values to walk, the suggestion says which input is missing
+            pass
+        elif not hasattr(domain, 'instructor_slots'):
+            # Plain value list (e.g. after forward checking): check values directly
+            sampled = len(domain) > MAX_PAIR_VALUES
+            for value in list(domain)[:MAX_PAIR_VALUES]:
+                failed = [k for k, check in enumerate(checks) if not check(variable, course, *value)]
+                if failed:
+                    record(failed, 1, value)
+        else:
+            budget = MAX_PAIR_VALUES
+            slot_failures = {}
+            room_signatures = {}  # timeslot -> [(failed room checks, room count, example room)]
+            for instructor, slots in domain.instructor_slots:
+                for timeslot in slots:
+                    if timeslot not in slot_failures:
+                        slot_failures[timeslot] = _failures(groups['slot'], checks, variable, course,
+                                                            timeslot, None, None)
+                        room_signatures[timeslot] = _room_signatures(groups['room'], checks, variable, course,
+                                                                     timeslot, domain.rooms, instructor,
+                                                                     bool(groups['pair']))
+                    common = slot_failures[timeslot] + _failures(groups['instructor'], checks, variable, course,
+                                                                 timeslot, None, instructor)
+                    for room_failed, count, room in room_signatures[timeslot]:
+                        failed = common + room_failed
+                        if groups['pair']:
+                            if budget <= 0:
+                                sampled = True
+                                continue
+                            budget -= 1
+                            failed += _failures(groups['pair'], checks, variable, course,
+                                                timeslot, room, instructor)
+                        if failed:
+                            record(sorted(failed), count, (timeslot, room, instructor))
+
+        if domain:
+            suggestion = _suggest(solver, variable, course, blocked_only_by, example)
+        else:
+            suggestion = _suggest_empty_domain(solver, variable, course)
+        actions[suggestion['action']] += 1
+        eliminated_total.update(eliminated_by)
+        session = {
+            'course_id': variable.course_id,
+            'section_id': variable.section_id,
+            'course_name': course.name if course else 'Unknown',
+            'domain_size': len(domain),
+            'eliminated_by': dict(eliminated_by.most_common()),
+            'blocked_only_by': dict(blocked_only_by.most_common()),
+            'suggestion': suggestion
+        }
+        if sampled:
+            session['sampled'] = True
+        sessions.append(session)
+
+    return {
+        'unscheduled': sessions,
+        'eliminated_by': dict(eliminated_total.most_common()),
+        'suggested_actions': dict(actions.most_common())
+    }
+
+
+def _failures(positions, checks, variable, course, timeslot, room, instructor):
+    return [k for k in positions if not checks[k](variable, course, timeslot, room, instructor)]
+
+
+def _room_signatures(positions, checks, variable, course, timeslot, rooms, instructor, per_room):
+    """Rooms grouped by the room checks they fail at timeslot: [(failed, count, example room)]"""
+    if per_room:
+        # Per-value checks follow: keep every room separate
+        return [(_failures(positions, checks, variable, course, timeslot, room, instructor), 1, room)
+                for room in rooms]
+    grouped = {}
+    for room in rooms:
+        failed = tuple(_failures(positions, checks, variable, course, timeslot, room, instructor))
+        entry = grouped.get(failed)
+        grouped[failed] = (entry[0] + 1, entry[1]) if entry else (1, room)
+    return [(list(failed), count, room) for failed, (count, room) in grouped.items()]
+
+
+def _suggest(solver, variable, course, blocked_only_by, example):
+    if not blocked_only_by:
+        # Every value conflicts on two or more resources; a fresh timeslot frees them all
+        return {'action': 'add_timeslot', 'resource': None, 'unlocks': 0,
+                'detail': 'Add a timeslot: every current option conflicts on more than one resource'}
+
+    resource, unlocks = blocked_only_by.most_common(1)[0]
+    timeslot, room, instructor = example[resource]
+    action, template = SUGGESTIONS.get(resource, ('relax_constraint', 'Relax constraint {name}'))
+    detail = template.format(
+        name=resource,
+        type=solver.required_room_type(variable, course),
+        seats=max(course.enrollment, 1),
+        course=variable.course_id,
+        slot=f'{timeslot.day} {timeslot.start_time}',
+        instructor=instructor.name,
+        cohorts=', '.join(solver.session_cohorts(variable))
+    )
+    return {'action': action, 'resource': resource, 'unlocks': unlocks, 'detail': detail}
+
+
+def _suggest_empty_domain(solver, variable, course):
+    """No candidate survived the static checks: say which input is missing"""
+    room_type = solver.required_room_type(variable, course)
+    if not any(variable.course_id in i.qualified_courses for i in solver.instructors):
+        action, detail = 'add_instructor', f'No instructor is qualified for {variable.course_id}'
+    elif not solver.rooms_fitting(room_type, course.enrollment):
+        action, detail = 'add_room', f'No {room_type} room has {course.enrollment} seats'
+    else:
+        action, detail = 'add_timeslot', ('No timeslot fits: the qualified instructors are unavailable '
+                                          'or the meeting is longer than the day')
+    return {'action': action, 'resource': None, 'unlocks': 0, 'detail': detail}
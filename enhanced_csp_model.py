@@ -1,14 +1,56 @@
 # enhanced_csp_model.py - Enhanced CSP Timetable Generator
+import bisect
+import math
 import time
 import random
-from collections import defaultdict
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+from constraints import CompiledConstraints
+from diagnostics import explain_unscheduled
+
+# Occupancy bitmaps use one bit per MINUTE_UNIT minutes of the day
+MINUTE_UNIT = 5
+
+def parse_clock(text):
+    """'9:00 AM' / '2:15 PM' / '14:15' -> minutes after midnight; ValueError if malformed"""
+    value = text.strip().upper()
+    suffix = value[-2:] if value[-2:] in ("AM", "PM") else ""
+    hours, _, minutes = value[:len(value) - len(suffix)].strip().partition(":")
+    if not hours.isdigit() or not (minutes or "0").isdigit():
+        raise ValueError(f"Invalid time: {text}")
+    hours, minutes = int(hours), int(minutes or 0)
+    if suffix:
+        hours = hours % 12 + (12 if suffix == "PM" else 0)
+    if hours > 23 or minutes > 59:
+        raise ValueError(f"Invalid time: {text}")
+    return hours * 60 + minutes
+
+def format_clock(minutes):
+    """Minutes after midnight -> '2:15 PM' (the format used in TimeSlots.csv)"""
+    hours, minutes = divmod(minutes, 60)
+    return f"{(hours - 1) % 12 + 1}:{minutes:02d} {'AM' if hours < 12 else 'PM'}"
 
 class Course:
-    def __init__(self, course_id, name, credits, type):
+    def __init__(self, course_id, name, credits, type, enrollment=0, sections=1, hours=0, session_minutes=0):
         self.course_id = course_id
         self.name = name
         self.credits = credits
         self.type = type
+        self.enrollment = int(enrollment or 0)  # Expected students per section (0 = unknown)
+        self.sections = max(1, int(sections or 1))  # Parallel sections (student groups)
+        self.hours = float(hours or 0)  # Weekly contact hours per session type (0 = one meeting)
+        self.session_minutes = int(session_minutes or 0)  # Meeting length (0 = one timeslot)
+
+    def meeting_plan(self, default_minutes):
+        """(meetings per week, meeting duration in minutes or 0 for one timeslot)
+
+        With weekly hours set, the hours are split into meetings of
+        session_minutes (or default_minutes, the usual timeslot length).
+        """
+        if not self.hours:
+            return 1, self.session_minutes
+        length = self.session_minutes or default_minutes
+        return max(1, math.ceil(self.hours * 60 / length)), self.session_minutes
 
     def __repr__(self):
         return f"Course({self.course_id}: {self.name})"
@@ -18,7 +60,11 @@ class Course:
             'course_id': self.course_id,
             'name': self.name,
             'credits': self.credits,
-            'type': self.type
+            'type': self.type,
+            'enrollment': self.enrollment,
+            'sections': self.sections,
+            'hours': self.hours,
+            'session_minutes': self.session_minutes
         }
 
 class Instructor:
@@ -66,6 +112,10 @@ class Timeslot:
         self.start_time = start_time
         self.end_time = end_time
         self.id = f"{day}_{start_time}"
+        self.start_minutes = parse_clock(start_time)
+        self.end_minutes = parse_clock(end_time)
+        if self.end_minutes <= self.start_minutes:
+            raise ValueError(f"Timeslot {self.id} ends before it starts")
 
     def __repr__(self):
         return f"Timeslot({self.id})"
@@ -78,13 +128,67 @@ class Timeslot:
             'id': self.id
         }
 
+class Cohort:
+    """A group of students who take the same sessions and so must never overlap
+
+    `courses` lists course ids, optionally with a section group: "CSE014"
+    (section 1) or "CSE014/2" (section 2). A comma-separated string is accepted
+    like Instructor.qualified_courses.
+    """
+    def __init__(self, cohort_id, name, courses):
+        self.cohort_id = cohort_id
+        self.name = name
+        if isinstance(courses, str):
+            courses = [c.strip() for c in courses.split(",")] if courses else []
+        self.courses = [c for c in courses if c]
+        self.sessions = [self.parse_course_ref(ref) for ref in self.courses]
+
+    @staticmethod
+    def parse_course_ref(ref):
+        """'CSE014/2' -> ('CSE014', 2); a bare course id means section group 1"""
+        course_id, _, group = ref.partition("/")
+        if not group:
+            return course_id.strip(), 1
+        if not group.strip().isdigit() or int(group) < 1:
+            raise ValueError(f"Invalid section group in course reference: {ref}")
+        return course_id.strip(), int(group)
+
+    def __repr__(self):
+        return f"Cohort({self.cohort_id}: {self.name})"
+    
+    def to_dict(self):
+        return {
+            'cohort_id': self.cohort_id,
+            'name': self.name,
+            'courses': self.courses
+        }
+
 class ClassVariable:
-    """Represents a class that needs to be scheduled"""
-    def __init__(self, course_id, section_id="S1"):
+    """Represents a class that needs to be scheduled
+
+    section_id is "S<n>" for single-type courses and "LECTURE"/"LAB" (one
+    section) or "LECTURE-<n>"/"LAB-<n>" for Lecture and Lab courses, with a
+    ":<k>" suffix when the session meets several times a week. `session` is
+    the id without that suffix and `group` the section number <n>: the
+    lecture and lab of one group are attended by the same students.
+    `duration` is the meeting length in minutes (0 = exactly one timeslot).
+    """
+    def __init__(self, course_id, section_id="S1", duration=0):
         self.course_id = course_id
         self.section_id = section_id
+        self.session = section_id.partition(":")[0]
+        self.group = self.section_group(section_id)
+        self.duration = duration
         self.assignment = None
     
+    @staticmethod
+    def section_group(section_id):
+        section_id = section_id.partition(":")[0]
+        if section_id[:1] == "S" and section_id[1:].isdigit():
+            return int(section_id[1:])
+        _, _, number = section_id.rpartition("-")
+        return int(number) if number.isdigit() else 1
+    
     def __repr__(self):
         return f"Class({self.course_id}-{self.section_id})"
     
@@ -94,10 +198,76 @@ class ClassVariable:
     def __eq__(self, other):
         return self.course_id == other.course_id and self.section_id == other.section_id
 
+class FactoredDomain(Sequence):
+    """Domain of one variable kept as factors instead of a materialized list
+
+    Values are (timeslot, room, instructor) with room from `rooms` and
+    (timeslot, instructor) from `instructor_slots`, a list of
+    (instructor, timeslots) pairs. Memory is O(rooms + instructors + shared
+    timeslot tuples) instead of their product. It is a read-only Sequence,
+    so len(), indexing, iteration, random.choice and random.sample work as
+    on a list.
+    """
+    def __init__(self, rooms, instructor_slots):
+        self.rooms = tuple(rooms)
+        self.instructor_slots = [(i, slots) for i, slots in instructor_slots if slots]
+        # Value index -> instructor block via the running block starts
+        self._starts = []
+        size = 0
+        for _, slots in self.instructor_slots:
+            self._starts.append(size)
+            size += len(slots) * len(self.rooms)
+        self._size = size if self.rooms else 0
+
+    @property
+    def instructors(self):
+        return [instructor for instructor, _ in self.instructor_slots]
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('domain index out of range')
+        block = bisect.bisect_right(self._starts, index) - 1
+        instructor, slots = self.instructor_slots[block]
+        slot_index, room_index = divmod(index - self._starts[block], len(self.rooms))
+        return slots[slot_index], self.rooms[room_index], instructor
+
+    def __iter__(self):
+        for instructor, slots in self.instructor_slots:
+            for timeslot in slots:
+                for room in self.rooms:
+                    yield timeslot, room, instructor
+
+def count_qualified_instructors(instructors):
+    """Map course_id -> number of instructors qualified to teach it (one pass)"""
+    qualified_count = defaultdict(int)
+    for instructor in instructors:
+        for course_id in set(instructor.qualified_courses):
+            qualified_count[course_id] += 1
+    return qualified_count
+
+def select_schedulable_courses(courses, instructors, qualified_count=None):
+    """Return courses that have at least one qualified instructor
+
+    Sorted by number of qualified instructors, most first (better success
+    rate). Pass a precomputed count_qualified_instructors() result to reuse it.
+    """
+    if qualified_count is None:
+        qualified_count = count_qualified_instructors(instructors)
+    
+    schedulable = [course for course in courses if qualified_count[course.course_id] > 0]
+    schedulable.sort(key=lambda c: qualified_count[c.course_id], reverse=True)
+    return schedulable
+
 class EnhancedCSPTimetable:
     """Enhanced CSP solver with improved constraints and heuristics"""
     
-    def __init__(self, courses, instructors, rooms, timeslots):
+    def __init__(self, courses, instructors, rooms, timeslots, constraints=None, parameters=None,
+                 cohorts=None, domain_cache=None):
         self.courses = courses
         self.instructors = instructors
         self.rooms = rooms
@@ -106,33 +276,162 @@ class EnhancedCSPTimetable:
         self.variables = []
         self.assignments = {}
         self.domains = {}
+        # Optional dict shared by solvers over the same dataset version (see
+        # DatasetSnapshot.domain_cache); static domains are computed once per
+        # version and constraint set instead of once per solve
+        self._domain_cache = domain_cache
+        self._courses_by_id = {c.course_id: c for c in courses}
+        self._qualified_by_course = defaultdict(list)
+        for instructor in instructors:
+            for course_id in dict.fromkeys(instructor.qualified_courses):
+                self._qualified_by_course[course_id].append(instructor)
         
         # Statistics for soft constraints
         self.soft_constraint_violations = 0
         self.instructor_workload = defaultdict(int)
         
+        # Active hard/soft constraints (see constraints.py), compiled against
+        # occupancy indexes that assign()/unassign() keep in sync, so checks
+        # and soft-cost deltas are O(1) instead of scans
+        # Timeslots are meeting start points; a meeting occupies the minutes
+        # [start, max(slot end, start + duration)) of its day
+        self._slot_position = self._day_positions(timeslots)
+        self._day_end = {}
+        for ts in timeslots:
+            self._day_end[ts.day] = max(self._day_end.get(ts.day, 0), ts.end_minutes)
+        lengths = Counter(ts.end_minutes - ts.start_minutes for ts in timeslots)
+        self.standard_minutes = lengths.most_common(1)[0][0] if lengths else 90
+        self._mask_cache = {}
+        # Warm start: (course_id, section_id) -> (timeslot_id, room_id, instructor_id)
+        # of the previous timetable, read by the 'stability' soft constraint
+        self.previous_assignments = {}
+        self.warm_start_stats = None
+        self.resume_stats = None
+        # Capacity index: rooms of each type sorted by capacity, for bisect lookups
+        self._rooms_by_type = defaultdict(list)
+        for room in sorted(rooms, key=lambda r: r.capacity):
+            self._rooms_by_type[room.type].append(room)
+        self._room_capacities = {room_type: [r.capacity for r in typed]
+                                 for room_type, typed in self._rooms_by_type.items()}
+        # (course_id, section group) -> ids of the cohorts attending it
+        self.cohorts = list(cohorts or [])
+        session_cohorts = defaultdict(list)
+        for cohort in self.cohorts:
+            for session in cohort.sessions:
+                session_cohorts[session].append(cohort.cohort_id)
+        self._session_cohorts = {session: tuple(ids) for session, ids in session_cohorts.items()}
+        self.compiled_constraints = CompiledConstraints(self, constraints, parameters)
+        self._hard_checks = self.compiled_constraints.hard_checks
+        self._soft_terms = self.compiled_constraints.soft_terms
+        self._index_updates = self.compiled_constraints.index_updates
+        self._interval_updates = self.compiled_constraints.interval_updates
+        self.clear_assignments()
+        
+    def clear_assignments(self):
+        """Drop all assignments and reset the occupancy indexes"""
+        for variable in self.assignments:
+            variable.assignment = None
+        self.assignments = {}
+        self.compiled_constraints.reset()
+        self.soft_cost = 0
+    
+    def assign(self, variable, assignment):
+        """Record an assignment and update the indexes and running soft cost"""
+        timeslot, room, instructor = assignment
+        self.soft_cost += self._soft_cost_delta(variable, timeslot, room, instructor)
+        self.assignments[variable] = assignment
+        variable.assignment = assignment
+        self._update_indexes(variable, timeslot, room, instructor, 1)
+    
+    def unassign(self, variable):
+        """Remove a variable's assignment; returns the assignment it had"""
+        assignment = self.assignments.pop(variable)
+        variable.assignment = None
+        timeslot, room, instructor = assignment
+        self._update_indexes(variable, timeslot, room, instructor, -1)
+        self.soft_cost -= self._soft_cost_delta(variable, timeslot, room, instructor)
+        return assignment
+    
+    def _update_indexes(self, variable, timeslot, room, instructor, sign):
+        for key, index in self._index_updates:
+            index[key(self, variable, timeslot, room, instructor)] += sign
+        if self._interval_updates:
+            # Interval indexes hold one bitmap per key; the no-overlap checks
+            # keep bitmaps under one key disjoint, so adding equals OR-ing
+            mask = sign * self.session_mask(variable, timeslot)
+            for keys, index in self._interval_updates:
+                for key in keys(self, variable, timeslot, room, instructor):
+                    index[key] += mask
+    
+    def session_interval(self, variable, timeslot):
+        """(start, end) in minutes after midnight of a meeting placed at timeslot"""
+        return timeslot.start_minutes, max(timeslot.end_minutes, timeslot.start_minutes + variable.duration)
+    
+    def session_mask(self, variable, timeslot):
+        """Bitmap of the MINUTE_UNIT blocks a meeting occupies (cached per duration/slot)"""
+        key = (variable.duration, timeslot.id)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            start, end = self.session_interval(variable, timeslot)
+            first = start // MINUTE_UNIT
+            last = -(-end // MINUTE_UNIT)
+            mask = self._mask_cache[key] = ((1 << (last - first)) - 1) << first
+        return mask
+    
+    def day_end(self, day):
+        """End of the last timeslot of a day, in minutes after midnight"""
+        return self._day_end.get(day, 0)
+    
+    def session_cohorts(self, variable):
+        """Ids of the cohorts attending a session (empty tuple if none)"""
+        return self._session_cohorts.get((variable.course_id, variable.group), ())
+    
+    def slot_position(self, timeslot):
+        """Position of a timeslot within its day, by start time (None if unknown)"""
+        return self._slot_position.get(timeslot.id)
+    
+    @staticmethod
+    def _day_positions(timeslots):
+        starts_by_day = defaultdict(set)
+        for ts in timeslots:
+            starts_by_day[ts.day].add(ts.start_minutes)
+        order = {day: {start: i for i, start in enumerate(sorted(starts))}
+                 for day, starts in starts_by_day.items()}
+        return {ts.id: order[ts.day][ts.start_minutes] for ts in timeslots}
+    
     def create_variables(self):
         """Create variables for all courses that need to be scheduled
         
         IMPORTANT: Courses with type 'Lecture and Lab' need TWO separate sessions:
         - One lecture session (in a lecture hall)
         - One lab session (in a lab room)
+        Courses with several sections get one session (or pair) per section,
+        and courses with weekly hours one variable per meeting of each session.
         """
         print("Creating variables (classes to schedule)...")
         
         self.variables = []
         for course in self.courses:
             if "and" in course.type.lower():
-                # Course needs BOTH lecture and lab sessions
-                lecture_var = ClassVariable(course.course_id, section_id="LECTURE")
-                lab_var = ClassVariable(course.course_id, section_id="LAB")
-                self.variables.append(lecture_var)
-                self.variables.append(lab_var)
-                print(f"  {course.course_id}: Created 2 sessions (Lecture + Lab)")
+                # Course needs BOTH lecture and lab sessions (per section)
+                if course.sections == 1:
+                    suffixes = [""]
+                else:
+                    suffixes = [f"-{n}" for n in range(1, course.sections + 1)]
+                sessions = [prefix + suffix for suffix in suffixes for prefix in ("LECTURE", "LAB")]
             else:
-                # Regular course - only one session
-                var = ClassVariable(course.course_id, section_id="S1")
-                self.variables.append(var)
+                # Regular course - one session per section
+                sessions = [f"S{n}" for n in range(1, course.sections + 1)]
+            
+            meetings, duration = course.meeting_plan(self.standard_minutes)
+            for session in sessions:
+                if meetings == 1:
+                    self.variables.append(ClassVariable(course.course_id, session, duration))
+                else:
+                    self.variables.extend(ClassVariable(course.course_id, f"{session}:{k}", duration)
+                                          for k in range(1, meetings + 1))
+            if len(sessions) * meetings > 1:
+                print(f"  {course.course_id}: Created {len(sessions) * meetings} sessions")
             
         print(f"Created {len(self.variables)} variables to schedule (includes split Lecture+Lab courses)")
         return self.variables
@@ -146,164 +445,155 @@ class EnhancedCSPTimetable:
         """
         print("Creating domains for each variable...")
         
+        # Static checks by the factors they read (see Constraint.scope); checks
+        # with another or no scope are left to is_assignment_valid()
+        by_scope = defaultdict(list)
+        for scope, check in self.compiled_constraints.static_checks:
+            by_scope[scope].append(check)
+        slot_checks = by_scope[frozenset(('variable', 'timeslot'))] + by_scope[frozenset(('timeslot',))]
+        room_checks = by_scope[frozenset(('variable', 'room'))] + by_scope[frozenset(('room',))]
+        instructor_checks = (by_scope[frozenset(('variable', 'instructor'))] +
+                             by_scope[frozenset(('instructor',))])
+        pair_checks = by_scope[frozenset(('variable', 'timeslot', 'instructor'))]
+        shared_pair_checks = by_scope[frozenset(('timeslot', 'instructor'))]
+        
+        # Timeslots each instructor may teach, shared by all variables
+        shared_slots = {}
+        def instructor_timeslots(instructor):
+            slots = shared_slots.get(instructor.instructor_id)
+            if slots is None:
+                slots = shared_slots[instructor.instructor_id] = tuple(
+                    ts for ts in self.timeslots
+                    if all(check(None, None, ts, None, instructor) for check in shared_pair_checks))
+            return slots
+        
+        cache = None
+        if self._domain_cache is not None:
+            cache = self._domain_cache.setdefault(self.compiled_constraints.static_key, {})
+        reused = 0
+        
         for variable in self.variables:
-            course = next((c for c in self.courses if c.course_id == variable.course_id), None)
+            course = self._courses_by_id.get(variable.course_id)
             if not course:
                 continue
+            
+            if cache is not None:
+                domain = cache.get((variable.course_id, variable.section_id))
+                if domain is not None:
+                    self.domains[variable] = domain
+                    reused += 1
+                    continue
                 
             # Find qualified instructors
             qualified_instructors = [
-                instr for instr in self.instructors 
-                if variable.course_id in instr.qualified_courses
+                instr for instr in self._qualified_by_course.get(variable.course_id, [])
+                if all(check(variable, course, None, None, instr) for check in instructor_checks)
             ]
             
-            # Find suitable rooms based on VARIABLE SECTION TYPE (not just course type)
-            if variable.section_id == "LAB":
-                # This is the LAB portion of a "Lecture and Lab" course
-                suitable_rooms = [room for room in self.rooms if room.type == "Lab"]
-            elif variable.section_id == "LECTURE":
-                # This is the LECTURE portion of a "Lecture and Lab" course
-                suitable_rooms = [room for room in self.rooms if room.type == "Lecture"]
-            elif "Lab" in course.type:
-                # Regular lab-only course
-                suitable_rooms = [room for room in self.rooms if room.type == "Lab"]
-            else:
-                # Regular lecture-only course
-                suitable_rooms = [room for room in self.rooms if room.type == "Lecture"]
+            # Find suitable rooms based on VARIABLE SECTION TYPE (not just course type),
+            # skipping rooms too small for the expected enrollment
+            room_type = self.required_room_type(variable, course)
+            min_capacity = course.enrollment if 'room_fits' in self.compiled_constraints.names else 0
+            suitable_rooms = [room for room in self.rooms_fitting(room_type, min_capacity)
+                              if all(check(variable, course, None, room, None) for check in room_checks)]
+            
+            # Timeslots this session can start in (e.g. long meetings must fit in the day)
+            timeslots = [ts for ts in self.timeslots
+                         if all(check(variable, course, ts, None, None) for check in slot_checks)]
+            all_slots = len(timeslots) == len(self.timeslots)
+            timeslot_ids = {ts.id for ts in timeslots}
             
-            # Build domain
-            domain = []
-            for timeslot in self.timeslots:
-                for room in suitable_rooms:
-                    for instructor in qualified_instructors:
-                        # Pre-filter obviously invalid assignments
-                        if self._is_instructor_available(instructor, timeslot):
-                            domain.append((timeslot, room, instructor))
+            # Build the domain as factors: rooms x (instructor, allowed timeslots)
+            instructor_slots = []
+            for instructor in qualified_instructors:
+                slots = instructor_timeslots(instructor)
+                if not all_slots:
+                    slots = tuple(ts for ts in slots if ts.id in timeslot_ids)
+                if pair_checks:
+                    slots = tuple(ts for ts in slots
+                                  if all(check(variable, course, ts, None, instructor) for check in pair_checks))
+                instructor_slots.append((instructor, slots))
             
-            self.domains[variable] = domain
+            self.domains[variable] = FactoredDomain(suitable_rooms, instructor_slots)
+            if cache is not None:
+                cache[(variable.course_id, variable.section_id)] = self.domains[variable]
             
         # Print summary
         total_domain_size = sum(len(self.domains.get(var, [])) for var in self.variables)
         avg_domain_size = total_domain_size / len(self.variables) if self.variables else 0
         print(f"Average domain size: {avg_domain_size:.1f} assignments per variable")
+        if reused:
+            print(f"Reused {reused} cached domains")
             
         return self.domains
     
-    def _is_instructor_available(self, instructor, timeslot):
-        """Check if instructor is available at this timeslot"""
-        unavailable_day = instructor.unavailable_day.replace("Not on", "").strip()
-        return timeslot.day.lower() != unavailable_day.lower()
+    def rooms_fitting(self, room_type, min_capacity=0):
+        """Rooms of a type with at least min_capacity seats, smallest first"""
+        start = bisect.bisect_left(self._room_capacities.get(room_type, []), min_capacity)
+        return self._rooms_by_type.get(room_type, [])[start:]
     
-    def is_assignment_valid(self, variable, timeslot, room, instructor):
-        """Check if an assignment violates any HARD constraints"""
-        course = next((c for c in self.courses if c.course_id == variable.course_id), None)
-        if not course:
-            return False
-        
-        # HARD CONSTRAINT 1: Room type must match the SECTION type (not just course type)
-        if variable.section_id == "LAB":
-            # LAB section of "Lecture and Lab" course - must be in a lab
-            if room.type != "Lab":
-                return False
-        elif variable.section_id == "LECTURE":
-            # LECTURE section of "Lecture and Lab" course - must be in lecture hall
-            if room.type != "Lecture":
-                return False
+    def required_room_type(self, variable, course):
+        """Room type a session needs: its section type, else the course type"""
+        if variable.section_id.startswith("LAB"):
+            # This is the LAB portion of a "Lecture and Lab" course
+            return "Lab"
+        elif variable.section_id.startswith("LECTURE"):
+            # This is the LECTURE portion of a "Lecture and Lab" course
+            return "Lecture"
         elif "Lab" in course.type:
             # Regular lab-only course
-            if room.type != "Lab":
-                return False
+            return "Lab"
         else:
             # Regular lecture-only course
-            if room.type != "Lecture":
-                return False
-        
-        # HARD CONSTRAINT 2: Instructor cannot teach on their unavailable day
-        if not self._is_instructor_available(instructor, timeslot):
-            return False
-        
-        # HARD CONSTRAINT 3: Instructor must be qualified for the course
-        if variable.course_id not in instructor.qualified_courses:
-            return False
-            
-        # HARD CONSTRAINT 4: No room double-booking
-        for other_var, other_assignment in self.assignments.items():
-            if other_assignment[0].id == timeslot.id and other_assignment[1].room_id == room.room_id:
-                return False
-                
-        # HARD CONSTRAINT 5: No instructor double-booking
-        for other_var, other_assignment in self.assignments.items():
-            if other_assignment[0].id == timeslot.id and other_assignment[2].instructor_id == instructor.instructor_id:
-                return False
-        
-        # HARD CONSTRAINT 6: Instructor workload limit (max 4 classes per day)
-        day_workload = sum(1 for other_var, other_assignment in self.assignments.items() 
-                          if other_assignment[0].day == timeslot.day 
-                          and other_assignment[2].instructor_id == instructor.instructor_id)
-        if day_workload >= 4:
+            return "Lecture"
+    
+    def is_assignment_valid(self, variable, timeslot, room, instructor):
+        """Check if an assignment violates any HARD constraints (variable must be unassigned)"""
+        course = self._courses_by_id.get(variable.course_id)
+        if not course:
             return False
         
-        # HARD CONSTRAINT 7: Lecture and Lab sections of same course must be at DIFFERENT times
-        # (Students can't attend both at the same time!)
-        for other_var, other_assignment in self.assignments.items():
-            if (variable.course_id == other_var.course_id and 
-                variable.section_id != other_var.section_id and
-                other_assignment[0].id == timeslot.id):
-                # Same course, different sections (LECTURE vs LAB), same timeslot = CONFLICT!
+        # Compiled hard constraints, cheapest/most selective first
+        for check in self._hard_checks:
+            if not check(variable, course, timeslot, room, instructor):
                 return False
                 
         return True
     
     def calculate_soft_constraint_score(self, variable, timeslot, room, instructor):
         """Calculate a score based on soft constraints (lower is better)"""
-        score = 0
-        
-        # SOFT CONSTRAINT 1: Very light penalty for early/late slots (don't avoid them too much)
-        if timeslot.start_time in ["9:00 AM"]:
-            score += 0.5  # Very small penalty for early morning
-        if timeslot.start_time in ["2:15 PM"]:
-            score += 0.5  # Very small penalty for late afternoon
-        
-        # SOFT CONSTRAINT 2: Balance day distribution (but less aggressive)
-        day_count = sum(1 for ass in self.assignments.values() if ass[0].day == timeslot.day)
-        score += day_count * 0.5  # Reduced penalty - still balance but don't avoid days
-        
-        # SOFT CONSTRAINT 3: Instructor workload balance
-        instructor_count = sum(1 for ass in self.assignments.values() 
-                              if ass[2].instructor_id == instructor.instructor_id)
-        score += instructor_count * 0.3  # Prefer instructors with fewer classes
-        
-        # SOFT CONSTRAINT 4: Prefer larger rooms for lecture courses
-        course = next((c for c in self.courses if c.course_id == variable.course_id), None)
-        if course and "Lab" not in course.type and room.capacity < 50:
-            score += 1
-        
-        # SOFT CONSTRAINT 5: Bonus for consecutive slots (reduces gaps)
-        consecutive_bonus = 0
-        for other_var, other_assignment in self.assignments.items():
-            if other_assignment[2].instructor_id == instructor.instructor_id:
-                if other_assignment[0].day == timeslot.day:
-                    # Check if it's the same timeslot or adjacent
-                    if self._are_timeslots_consecutive(timeslot, other_assignment[0]):
-                        consecutive_bonus -= 2  # Bonus for consecutive slots (reduces gaps)
-        score += consecutive_bonus
+        score = self._soft_cost_delta(variable, timeslot, room, instructor)
         
         # Add randomness to explore more possibilities
         score += random.uniform(-0.5, 0.5)
         
         return score
     
+    def _soft_cost_delta(self, variable, timeslot, room, instructor):
+        """Soft cost added by placing an (unassigned) variable here, in O(1) from the indexes"""
+        course = self._courses_by_id.get(variable.course_id)
+        return sum(term(variable, course, timeslot, room, instructor) for term in self._soft_terms)
+    
+    def soft_constraint_cost(self):
+        """Total soft-constraint cost of the current assignments (lower is better)
+
+        Same terms and weights as calculate_soft_constraint_score, without the
+        random noise, so schedules can be compared with each other. Recomputed
+        from scratch by replaying the assignments into empty indexes.
+        """
+        assignments = list(self.assignments.items())
+        self.clear_assignments()
+        for variable, assignment in assignments:
+            self.assign(variable, assignment)
+        return round(self.soft_cost, 2)
+    
     def _are_timeslots_consecutive(self, slot1, slot2):
         """Check if two timeslots are consecutive"""
-        time_order = ["9:00 AM", "10:45 AM", "12:30 PM", "2:15 PM"]
         if slot1.day != slot2.day:
             return False
-        try:
-            idx1 = time_order.index(slot1.start_time)
-            idx2 = time_order.index(slot2.start_time)
-            return abs(idx1 - idx2) == 1
-        except:
-            return False
+        idx1 = self.slot_position(slot1)
+        idx2 = self.slot_position(slot2)
+        return idx1 is not None and idx2 is not None and abs(idx1 - idx2) == 1
     
     def select_unassigned_variable(self):
         """Select next variable using MRV (Minimum Remaining Values) heuristic"""
@@ -321,11 +611,10 @@ class EnhancedCSPTimetable:
         if not domain:
             return []
         
-        # For speed: limit scoring to first 100 options (usually enough)
+        # For speed: limit scoring to 100 options (usually enough)
         if len(domain) > 100:
-            # Randomly sample to ensure variety
-            random.shuffle(domain)
-            domain = domain[:100]
+            # Randomly sample to ensure variety (O(100) on a FactoredDomain)
+            domain = random.sample(domain, 100)
         
         # Score each assignment
         scored_assignments = []
@@ -352,8 +641,25 @@ class EnhancedCSPTimetable:
                     return False
         return True
     
-    def solve_enhanced(self, timeout_seconds=60):
-        """Enhanced solver using FAST GREEDY algorithm with constraint satisfaction"""
+    def solve_enhanced(self, timeout_seconds=60, max_attempts=5, optimize_seconds=0, warm_start=None,
+                       checkpoint=None, resume=None):
+        """Enhanced solver using FAST GREEDY algorithm with constraint satisfaction
+        
+        timeout_seconds bounds the whole solve: greedy attempts stop once
+        another one would run into the optimize_seconds reserved at the end,
+        and optimize() gets at most the time that is left. With
+        optimize_seconds > 0 the best greedy result is then improved by
+        optimize() for that long. With warm_start (a previous export_to_dict()
+        result) every attempt starts from the still-valid previous assignments
+        and only searches for the rest.
+        
+        With a checkpoint (checkpoint.Checkpointer) the best result so far and
+        the search phase are saved periodically; resume (a loaded checkpoint)
+        restores them and skips the work already done.
+        """
+        if warm_start is not None and resume is not None:
+            raise ValueError('warm_start and resume cannot be combined')
+        
         print("\n" + "="*80)
         print("🚀 FAST GREEDY CSP SOLVER - Starting...")
         print("="*80)
@@ -377,20 +683,46 @@ class EnhancedCSPTimetable:
         # Use FAST GREEDY algorithm instead of slow backtracking
         best_assignments = {}
         best_count = 0
+        first_attempt = 0
+        state = {}
         
-        max_attempts = 5  # Try multiple times with different orders
+        if resume is not None:
+            # Continue from the checkpoint: its best result, then the next attempt or phase
+            state = resume.get('state', {})
+            self.clear_assignments()
+            self.resume_stats = self.restore_encoded(resume.get('best', []))
+            if self.resume_stats['dropped']:
+                # The catalogue changed since the checkpoint: re-place what no longer fits
+                self._greedy_schedule()
+            best_assignments = dict(self.assignments)
+            best_count = len(best_assignments)
+            if state.get('phase') == 'greedy':
+                first_attempt = state.get('attempt', -1) + 1
+            else:
+                first_attempt = max_attempts
+            print(f"\n♻️  Resumed {self.resume_stats['restored']} sessions from checkpoint "
+                  f"(phase {state.get('phase')}, dropped {self.resume_stats['dropped']})")
         
-        for attempt in range(max_attempts):
+        # Try multiple times with different orders
+        # Greedy attempts leave optimize_seconds of the budget for optimize()
+        greedy_deadline = start_time + max(0, timeout_seconds - optimize_seconds)
+        for attempt in range(first_attempt, max_attempts):
             print(f"\n🔄 Attempt {attempt + 1}/{max_attempts}")
+            attempt_started = time.time()
             
-            # Clear previous assignments
-            self.assignments = {}
+            # Clear previous assignments (domains are static; each attempt
+            # samples them differently)
+            self.clear_assignments()
             
-            # Recreate domains with randomization
-            self.create_domains()
+            # Keep what is still valid from the previous timetable
+            if warm_start is not None:
+                stats = self.seed_assignments(warm_start)
+                if attempt == 0:
+                    print(f"   ♻️  Warm start: kept {stats['kept']}, dropped {stats['dropped']} previous sessions")
             
             # GREEDY SCHEDULING: Assign each variable to best available slot
-            scheduled = self._greedy_schedule()
+            self._greedy_schedule()
+            scheduled = len(self.assignments)  # includes warm-start sessions
             
             # Keep track of best result
             if scheduled > best_count:
@@ -398,21 +730,40 @@ class EnhancedCSPTimetable:
                 best_assignments = dict(self.assignments)
                 print(f"   ✨ New best: {best_count}/{len(self.variables)} sessions scheduled ({best_count/len(self.variables)*100:.1f}%)")
             
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(self.encode_assignments(best_assignments), phase='greedy', attempt=attempt)
+            
             # If we got 95%+ success, that's good enough
             if scheduled >= len(self.variables) * 0.95:
                 print(f"   ✅ Excellent result (95%+ scheduled)!")
                 break
             
-            # Check elapsed time
-            elapsed = time.time() - start_time
-            if elapsed > 20:  # Stop after 20 seconds
-                print(f"   ⏰ Time limit reached ({elapsed:.1f}s)")
+            # Stop when another attempt as long as this one would overrun the budget
+            now = time.time()
+            if attempt + 1 < max_attempts and now + (now - attempt_started) > greedy_deadline:
+                print(f"   ⏰ Time limit reached ({now - start_time:.1f}s)")
                 break
         
         # Use the best assignments found
-        self.assignments = best_assignments
-        for var, assignment in self.assignments.items():
-            var.assignment = assignment
+        self.clear_assignments()
+        for var, assignment in best_assignments.items():
+            self.assign(var, assignment)
+        
+        if checkpoint is not None and state.get('phase') not in ('optimize', 'done'):
+            checkpoint.save(self.encode_assignments(), phase='optimize', optimize_elapsed=0)
+        
+        if optimize_seconds > 0 and state.get('phase') != 'done':
+            # A resumed optimization only gets the budget it had left
+            resumed = state.get('phase') == 'optimize'
+            spent = state.get('optimize_elapsed', 0) if resumed else 0
+            budget = min(optimize_seconds - spent, timeout_seconds - (time.time() - start_time))
+            if budget > 0:
+                self.optimize(time_budget=budget,
+                              initial_temperature=state.get('temperature', 2.0) if resumed else 2.0,
+                              checkpoint=checkpoint, elapsed_before=spent)
+        
+        if checkpoint is not None:
+            checkpoint.save(self.encode_assignments(), phase='done')
         
         end_time = time.time()
         elapsed = end_time - start_time
@@ -435,6 +786,10 @@ class EnhancedCSPTimetable:
             if i % 20 == 0 and i > 0:
                 print(f"     Progress: {i}/{len(sorted_vars)} sessions processed, {scheduled} scheduled")
             
+            # Keep sessions that are already placed (e.g. merged or seeded assignments)
+            if variable in self.assignments:
+                continue
+            
             # Get ordered domain values
             domain = self.order_domain_values(variable)
             
@@ -444,12 +799,130 @@ class EnhancedCSPTimetable:
                 
                 if self.is_assignment_valid(variable, timeslot, room, instructor):
                     # Make assignment
-                    self.assignments[variable] = assignment
-                    variable.assignment = assignment
+                    self.assign(variable, assignment)
                     scheduled += 1
                     break
         
         return scheduled
+    
+    def optimize(self, time_budget=5.0, initial_temperature=2.0, final_temperature=0.01, tabu_tenure=15,
+                 checkpoint=None, elapsed_before=0):
+        """Anytime local search on the current assignments (simulated annealing + tabu list)
+        
+        Moves keep every hard constraint satisfied:
+        - insert: place an unscheduled session
+        - move:   give a session a different (timeslot, room, instructor) from its domain
+        - swap:   exchange the timeslots of two sessions
+        The objective is unscheduled sessions first, then soft cost; every move
+        is scored from the occupancy indexes in O(1). Recently moved sessions
+        are tabu for tabu_tenure iterations. The temperature cools
+        geometrically with elapsed time, from initial_temperature to
+        final_temperature at the end of time_budget, so the whole budget is
+        annealed however fast iterations run. The best schedule seen within
+        time_budget seconds is restored at the end. A checkpoint, when given,
+        is offered the best schedule and temperature every 1000 iterations;
+        elapsed_before is the optimization time spent before a resume.
+        """
+        unscheduled_penalty = 1000
+        assignable = [v for v in self.variables if self.domains.get(v)]
+        if not assignable:
+            return {'iterations': 0, 'initial_cost': 0, 'best_cost': 0}
+        
+        def objective():
+            return self.soft_cost + unscheduled_penalty * (len(self.variables) - len(self.assignments))
+        
+        current = initial = best_cost = objective()
+        best_assignments = dict(self.assignments)
+        temperature = initial_temperature
+        tabu_until = {}
+        iterations = accepted = 0
+        started = time.time()
+        deadline = started + time_budget
+        cooling_ratio = final_temperature / initial_temperature
+        
+        print(f"\n🔥 Optimizing for {time_budget:.1f}s (initial cost {initial:.1f})...")
+        
+        while True:
+            now = time.time()
+            if now >= deadline:
+                break
+            iterations += 1
+            temperature = initial_temperature * cooling_ratio ** ((now - started) / time_budget)
+            if checkpoint is not None and iterations % 1000 == 0 and checkpoint.due():
+                # A resume continues the same curve: from this temperature over the remaining budget
+                checkpoint.save(self.encode_assignments(best_assignments), phase='optimize',
+                                temperature=temperature, best_cost=best_cost,
+                                optimize_elapsed=elapsed_before + now - started)
+            variable = random.choice(assignable)
+            
+            if variable not in self.assignments:
+                # INSERT: always an improvement if the sampled value fits
+                timeslot, room, instructor = random.choice(self.domains[variable])
+                if self.is_assignment_valid(variable, timeslot, room, instructor):
+                    self.assign(variable, (timeslot, room, instructor))
+                    accepted += 1
+            elif tabu_until.get(variable, 0) > iterations:
+                continue
+            elif random.random() < 0.7:
+                # MOVE
+                new_value = random.choice(self.domains[variable])
+                old_value = self.unassign(variable)
+                if new_value is old_value or not self.is_assignment_valid(variable, *new_value):
+                    self.assign(variable, old_value)
+                    continue
+                self.assign(variable, new_value)
+                if self._accept(objective() - current, temperature):
+                    tabu_until[variable] = iterations + tabu_tenure
+                    accepted += 1
+                else:
+                    self.unassign(variable)
+                    self.assign(variable, old_value)
+            else:
+                # SWAP timeslots with another scheduled session
+                other = random.choice(assignable)
+                if other is variable or other not in self.assignments or tabu_until.get(other, 0) > iterations:
+                    continue
+                old_value = self.unassign(variable)
+                other_old = self.unassign(other)
+                new_value = (other_old[0], old_value[1], old_value[2])
+                other_new = (old_value[0], other_old[1], other_old[2])
+                if self.is_assignment_valid(variable, *new_value):
+                    self.assign(variable, new_value)
+                    if self.is_assignment_valid(other, *other_new):
+                        self.assign(other, other_new)
+                        if self._accept(objective() - current, temperature):
+                            tabu_until[variable] = tabu_until[other] = iterations + tabu_tenure
+                            accepted += 1
+                            current = objective()
+                            if current < best_cost - 1e-9:
+                                best_cost = current
+                                best_assignments = dict(self.assignments)
+                            continue
+                        self.unassign(other)
+                    self.unassign(variable)
+                self.assign(variable, old_value)
+                self.assign(other, other_old)
+                continue
+            
+            current = objective()
+            if current < best_cost - 1e-9:
+                best_cost = current
+                best_assignments = dict(self.assignments)
+        
+        # Restore the best schedule seen
+        self.clear_assignments()
+        for variable, assignment in best_assignments.items():
+            self.assign(variable, assignment)
+        
+        print(f"   Iterations: {iterations}, accepted: {accepted}, "
+              f"cost {initial:.1f} -> {best_cost:.1f}")
+        return {'iterations': iterations, 'accepted': accepted,
+                'initial_cost': initial, 'best_cost': best_cost}
+    
+    @staticmethod
+    def _accept(delta, temperature):
+        """Metropolis criterion: always take improvements, sometimes take worse moves"""
+        return delta <= 0 or random.random() < math.exp(-delta / temperature)
 
     def _backtrack_enhanced(self):
         """Enhanced backtracking with better heuristics"""
@@ -484,8 +957,7 @@ class EnhancedCSPTimetable:
                 original_domains = {v: list(self.domains.get(v, [])) for v in self.variables}
                 
                 # Make assignment
-                self.assignments[variable] = assignment
-                variable.assignment = assignment
+                self.assign(variable, assignment)
                 
                 # Forward checking
                 if self.forward_check():
@@ -493,12 +965,78 @@ class EnhancedCSPTimetable:
                         return True
                 
                 # Backtrack
-                del self.assignments[variable]
-                variable.assignment = None
+                self.unassign(variable)
                 self.domains = original_domains
                 
         return False
     
+    def seed_assignments(self, previous):
+        """Keep every assignment of a previous timetable that is still valid
+        
+        `previous` is an export_to_dict() result (or its 'schedule' list).
+        Entries are replayed in order; each is kept if its session, timeslot,
+        room and instructor still exist and it passes every hard constraint
+        given the entries kept before it. Returns counts of kept and dropped
+        entries, with the reasons for dropping.
+        """
+        schedule = previous.get('schedule', []) if isinstance(previous, dict) else previous
+        variables = {(v.course_id, v.section_id): v for v in self.variables}
+        timeslots = {ts.id: ts for ts in self.timeslots}
+        rooms = {r.room_id: r for r in self.rooms}
+        instructors = {i.instructor_id: i for i in self.instructors}
+        
+        self.previous_assignments.clear()  # in place: the stability constraint holds a reference
+        stats = {'kept': 0, 'unknown_session': 0, 'missing_resource': 0, 'conflict': 0}
+        for entry in schedule:
+            variable = variables.get((entry.get('course_id'), entry.get('section_id')))
+            if variable is None:
+                stats['unknown_session'] += 1
+                continue
+            timeslot = timeslots.get(f"{entry.get('day')}_{entry.get('start_time')}")
+            room = rooms.get(entry.get('room_id'))
+            instructor = instructors.get(entry.get('instructor_id'))
+            if timeslot is None or room is None or instructor is None:
+                stats['missing_resource'] += 1
+                continue
+            self.previous_assignments[(variable.course_id, variable.section_id)] = (
+                timeslot.id, room.room_id, instructor.instructor_id)
+            if variable in self.assignments or not self.is_assignment_valid(variable, timeslot, room, instructor):
+                stats['conflict'] += 1
+                continue
+            self.assign(variable, (timeslot, room, instructor))
+            stats['kept'] += 1
+        
+        stats['dropped'] = len(schedule) - stats['kept']
+        self.warm_start_stats = stats
+        return stats
+    
+    def encode_assignments(self, assignments=None):
+        """Assignments as (course_id, section_id, timeslot_id, room_id, instructor_id) tuples"""
+        if assignments is None:
+            assignments = self.assignments
+        return [(v.course_id, v.section_id, ts.id, room.room_id, instructor.instructor_id)
+                for v, (ts, room, instructor) in assignments.items()]
+    
+    def restore_encoded(self, encoded):
+        """Assign every encode_assignments() entry that still exists and is valid
+        
+        Returns {'restored': n, 'dropped': n}.
+        """
+        variables = {(v.course_id, v.section_id): v for v in self.variables}
+        timeslots = {ts.id: ts for ts in self.timeslots}
+        rooms = {r.room_id: r for r in self.rooms}
+        instructors = {i.instructor_id: i for i in self.instructors}
+        restored = 0
+        for course_id, section_id, timeslot_id, room_id, instructor_id in encoded:
+            variable = variables.get((course_id, section_id))
+            value = (timeslots.get(timeslot_id), rooms.get(room_id), instructors.get(instructor_id))
+            if variable is None or None in value or variable in self.assignments:
+                continue
+            if self.is_assignment_valid(variable, *value):
+                self.assign(variable, value)
+                restored += 1
+        return {'restored': restored, 'dropped': len(encoded) - restored}
+    
     def get_statistics(self):
         """Get statistics about the generated timetable"""
         if not self.assignments:
@@ -592,8 +1130,12 @@ class EnhancedCSPTimetable:
             for instructor, count in top_instructors:
                 print(f"  {instructor[:30]:30}: {count:2} classes")
     
-    def export_to_dict(self):
-        """Export timetable to dictionary format for JSON serialization"""
+    def export_to_dict(self, diagnostics=True):
+        """Export timetable to dictionary format for JSON serialization
+        
+        diagnostics=False skips explain_unscheduled() for callers that only
+        compare placement and score.
+        """
         result = {
             'success': len(self.assignments) == len(self.variables),
             'total_courses': len(self.variables),
@@ -603,24 +1145,34 @@ class EnhancedCSPTimetable:
         
         for variable, assignment in self.assignments.items():
             timeslot, room, instructor = assignment
-            course = next((c for c in self.courses if c.course_id == variable.course_id), None)
+            course = self._courses_by_id.get(variable.course_id)
+            start, end = self.session_interval(variable, timeslot)
             
             result['schedule'].append({
                 'course_id': variable.course_id,
                 'course_name': course.name if course else 'Unknown',
                 'course_type': course.type if course else 'Unknown',
+                'enrollment': course.enrollment if course else 0,
                 'section_id': variable.section_id,
                 'day': timeslot.day,
                 'start_time': timeslot.start_time,
-                'end_time': timeslot.end_time,
+                'end_time': timeslot.end_time if end == timeslot.end_minutes else format_clock(end),
+                'duration_minutes': end - start,
                 'room_id': room.room_id,
                 'room_type': room.type,
                 'room_capacity': room.capacity,
                 'instructor_id': instructor.instructor_id,
                 'instructor_name': instructor.name,
-                'instructor_role': instructor.role
+                'instructor_role': instructor.role,
+                'cohorts': list(self.session_cohorts(variable))
             })
         
+        result['soft_score'] = self.soft_constraint_cost()
+        
+        # Why anything is left over (counted per domain factor, not per value)
+        if diagnostics:
+            result['diagnostics'] = explain_unscheduled(self)
+        
         # Add statistics
         stats = self.get_statistics()
         if stats:
@@ -0,0 +1,154 @@
+# exports.py - Render exported timetables to files
+#
+# Shared by the Flask export routes and the command-line solver (cli.py), so
+# it must not import Flask. Renderers take the `schedule` entries of an
+# export_to_dict() result and return text.
+#
+# build_archive() produces the term-start bundle: one timetable file per
+# instructor and per room. The schedule is grouped in a single pass and the
+# per-entity files are rendered one after another into one zip; rendering is
+# pure Python, so threads would only take turns on the GIL.
+import csv
+import datetime
+import io
+import json
+import re
+import zipfile
+from enhanced_csp_model import parse_clock
+
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+ARCHIVE_FORMATS = ('csv', 'json', 'ics')
+# archive folder -> (id field, name field) of a schedule entry
+ARCHIVE_GROUPS = {
+    'instructors': ('instructor_id', 'instructor_name'),
+    'rooms': ('room_id', 'room_id'),
+}
+
+CSV_HEADER = ['Course ID', 'Course Name', 'Day', 'Start Time', 'End Time',
+              'Room', 'Instructor', 'Course Type', 'Section']
+
+
+def schedule_to_csv(entries):
+    """One CSV row per scheduled meeting"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    for entry in entries:
+        writer.writerow([
+            entry['course_id'],
+            entry['course_name'],
+            entry['day'],
+            entry['start_time'],
+            entry['end_time'],
+            entry['room_id'],
+            entry['instructor_name'],
+            entry['course_type'],
+            entry['section_id']
+        ])
+    return output.getvalue()
+
+
+def result_to_json(result):
+    return json.dumps(result, indent=2)
+
+
+def schedule_to_ical(entries, calendar_name, term_start, weeks=15):
+    """Weekly recurring events from term_start (a date) for `weeks` weeks; ValueError if weeks < 1"""
+    if weeks < 1:
+        raise ValueError('weeks must be at least 1')
+    # RFC 5545 requires every event to carry the (UTC) time it was created
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//CSP TimetableAI//Timetable//EN',
+             f'X-WR-CALNAME:{_ical_text(calendar_name)}']
+    for entry in entries:
+        day = term_start + datetime.timedelta(days=(DAYS.index(entry['day']) - term_start.weekday()) % 7)
+        start = _ical_time(day, entry['start_time'])
+        end = _ical_time(day, entry['end_time'])
+        lines += [
+            'BEGIN:VEVENT',
+            f"UID:{_safe_name(entry['course_id'])}-{_safe_name(entry['section_id'])}-{start}@timetable",
+            f'DTSTAMP:{stamp}',
+            f'DTSTART:{start}',
+            f'DTEND:{end}',
+            f'RRULE:FREQ=WEEKLY;COUNT={weeks}',
+            f"SUMMARY:{_ical_text(entry['course_id'] + ' ' + entry['course_name'])}",
+            f"LOCATION:{_ical_text(entry['room_id'])}",
+            f"DESCRIPTION:{_ical_text(entry['section_id'] + ' - ' + entry['instructor_name'])}",
+            'END:VEVENT'
+        ]
+    lines.append('END:VCALENDAR')
+    return ''.join(_ical_fold(line) + '\r\n' for line in lines)
+
+
+def group_schedule(entries, groups=ARCHIVE_GROUPS):
+    """One pass over the schedule: {folder: {entity id: (name, entries in weekly order)}}"""
+    grouped = {folder: {} for folder in groups}
+    for entry in sorted(entries, key=_weekly_order):
+        for folder, (id_field, name_field) in groups.items():
+            bucket = grouped[folder].setdefault(entry[id_field], (entry[name_field], []))
+            bucket[1].append(entry)
+    return grouped
+
+
+def build_archive(result, formats=ARCHIVE_FORMATS, groups=tuple(ARCHIVE_GROUPS), term_start=None,
+                  weeks=15):
+    """Zip of <folder>/<entity id>.<format> for every instructor and room with sessions
+
+    Returns the archive bytes. ValueError on unknown formats or groups, or
+    weeks < 1.
+    """
+    unknown = [f for f in formats if f not in ARCHIVE_FORMATS] + [g for g in groups if g not in ARCHIVE_GROUPS]
+    if unknown or not formats or not groups:
+        raise ValueError(f"Unknown or empty export format/group: {', '.join(unknown) or 'none given'} "
+                         f"(formats: {', '.join(ARCHIVE_FORMATS)}; groups: {', '.join(ARCHIVE_GROUPS)})")
+    if weeks < 1:
+        raise ValueError('weeks must be at least 1')
+    term_start = term_start or datetime.date.today()
+    grouped = group_schedule(result['schedule'], {g: ARCHIVE_GROUPS[g] for g in groups})
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for folder, entities in grouped.items():
+            for entity_id, (name, entries) in sorted(entities.items()):
+                for fmt in formats:
+                    if fmt == 'csv':
+                        text = schedule_to_csv(entries)
+                    elif fmt == 'json':
+                        id_field = ARCHIVE_GROUPS[folder][0]
+                        text = json.dumps({id_field: entity_id, 'name': name, 'sessions': len(entries),
+                                           'schedule': entries}, indent=2)
+                    else:
+                        text = schedule_to_ical(entries, name, term_start, weeks)
+                    archive.writestr(f'{folder}/{_safe_name(entity_id)}.{fmt}', text)
+    return output.getvalue()
+
+
+def _weekly_order(entry):
+    return DAYS.index(entry['day']) if entry['day'] in DAYS else len(DAYS), parse_clock(entry['start_time'])
+
+
+def _safe_name(value):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(value)).strip('._') or 'unnamed'
+
+
+def _ical_time(day, clock):
+    minutes = parse_clock(clock)
+    return f'{day:%Y%m%d}T{minutes // 60:02d}{minutes % 60:02d}00'
+
+
+def _ical_text(value):
+    return str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ical_fold(line):
+    # RFC 5545: lines longer than 75 octets continue on lines starting with a space
+    chunks = []
+    limit = 75
+    while len(line.encode('utf-8')) > limit:
+        cut = limit
+        while len(line[:cut].encode('utf-8')) > limit:
+            cut -= 1
+        chunks.append(line[:cut])
+        line = line[cut:]
+        limit = 74  # the leading space counts
+    chunks.append(line)
+    return '\r\n '.join(chunks)
@@ -0,0 +1,58 @@
+# generation.py - Solve a dataset snapshot in one of the generate modes
+#
+# The single implementation of mode dispatch behind POST /api/generate and
+# cli.py, so it must not import Flask. Callers validate their own input,
+# pick the dataset version and decide what to do with the result:
+#
+#   solver = solve(dataset, 'anneal', timeout=120, seed=1)
+#   result = solver.export_to_dict()
+#
+# Solvers share the snapshot's domain cache, so repeated solves of one
+# dataset version skip the static filtering.
+import random
+from decomposition import solve_decomposed
+from enhanced_csp_model import EnhancedCSPTimetable, select_schedulable_courses
+
+GENERATE_MODES = ('greedy', 'anneal', 'decomposed')
+
+
+def solve(dataset, mode='greedy', timeout=60, seed=None, workers=None, optimize_seconds=5, constraints=None,
+          parameters=None, warm_start=None, checkpoint=None):
+    """Run one solver mode over a dataset snapshot; returns the solved solver
+
+    warm_start is a previous export_to_dict() result to start from. A
+    checkpoint (checkpoint.Checkpointer) is saved to during the solve and
+    resumed from when it already holds one. Decomposed mode supports
+    neither. Raises ValueError on bad options or when no course can be
+    scheduled.
+    """
+    if mode not in GENERATE_MODES:
+        raise ValueError(f"Unknown mode: {mode} (expected one of {', '.join(GENERATE_MODES)})")
+    courses = select_schedulable_courses(dataset.get_courses(), dataset.get_instructors())
+    if not courses:
+        raise ValueError('No courses with qualified instructors found')
+    if seed is not None:
+        random.seed(seed)
+
+    if mode == 'decomposed':
+        if warm_start is not None or checkpoint is not None:
+            raise ValueError("warm_start and checkpoints are not supported with mode 'decomposed'")
+        # Independent subproblems solved in parallel, then merged
+        return solve_decomposed(courses, dataset.get_instructors(), dataset.get_rooms(), dataset.get_timeslots(),
+                                timeout_seconds=timeout, workers=workers, seed=seed, constraints=constraints,
+                                parameters=parameters, cohorts=dataset.get_cohorts(),
+                                domain_cache=dataset.domain_cache)
+
+    solver = EnhancedCSPTimetable(courses, dataset.get_instructors(), dataset.get_rooms(), dataset.get_timeslots(),
+                                  constraints, parameters, dataset.get_cohorts(),
+                                  domain_cache=dataset.domain_cache)
+    resume = checkpoint.load() if checkpoint is not None else None
+    if mode == 'anneal':
+        # One greedy pass, then spend the budget improving it
+        solver.solve_enhanced(timeout_seconds=timeout, max_attempts=1,
+                              optimize_seconds=min(optimize_seconds, timeout),
+                              warm_start=warm_start, checkpoint=checkpoint, resume=resume)
+    else:
+        solver.solve_enhanced(timeout_seconds=timeout, warm_start=warm_start,
+                              checkpoint=checkpoint, resume=resume)
+    return solver
@@ -0,0 +1,73 @@
+# ============================================================================
+# CSP TimetableAI - Intelligent Scheduling System
+# Gunicorn Configuration (production serving)
+#
+# © 2025 Roqia. All Rights Reserved.
+# This software is proprietary and confidential.
+# ============================================================================
+#
+# Usage:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Timetable generation is CPU-bound and holds the GIL for the whole solve,
+# so throughput comes from processes, not threads. Each worker runs at most
+# TIMETABLE_MAX_SOLVES solves with TIMETABLE_SOLVE_QUEUE more waiting (see
+# admission.py); its threads cover those plus cheap GET requests, so keep
+# threads above max solves + queue depth.
+#
+# Decomposed solves and scenario batches fan out to process pools. All pools
+# together get TIMETABLE_SOLVER_PROCESSES processes (default: one per core),
+# so each solve may use that divided by workers x max solves, at least 1. With
+# the defaults that is 1 and pools run in the worker itself; lower
+# TIMETABLE_WORKERS to give each solve more processes instead.
+#
+# Graceful reload:
+#   kill -HUP <master pid>   re-reads this config and replaces the workers.
+#                            Old workers stop accepting connections and are
+#                            given graceful_timeout seconds to finish any
+#                            in-flight /api/generate request.
+#   kill -USR2 <master pid>  then -QUIT to the old master: needed to pick up
+#                            new *code*, because preload_app keeps the
+#                            application imported in the master.
+
+import gc
+import multiprocessing
+import os
+
+# Serve from the project directory so the relative CSV paths resolve
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.environ.get('TIMETABLE_BIND', '0.0.0.0:5000')
+
+# One process per core for CPU-bound solves
+workers = int(os.environ.get('TIMETABLE_WORKERS', multiprocessing.cpu_count()))
+# app.py splits the solver process budget over the workers
+os.environ['TIMETABLE_WORKERS'] = str(workers)
+worker_class = 'gthread'
+threads = int(os.environ.get('TIMETABLE_THREADS', 4))
+
+# Load the app (and the dataset) once in the master before forking
+preload_app = True
+
+# Requests may ask for at most TIMETABLE_MAX_TIMEOUT seconds of solving (app.py
+# rejects more). A queued request starts only after the solves ahead of it, so
+# on reload the last admitted one may need ceil((max solves + queue) / max
+# solves) such rounds; graceful_timeout covers that plus a margin for export.
+# These env defaults must match the ones read in app.py.
+max_solve_seconds = int(os.environ.get('TIMETABLE_MAX_TIMEOUT', 120))
+max_solves = max(1, int(os.environ.get('TIMETABLE_MAX_SOLVES', 1)))
+solve_queue = max(0, int(os.environ.get('TIMETABLE_SOLVE_QUEUE', 2)))
+solve_rounds = -(-(max_solves + solve_queue) // max_solves)
+timeout = int(os.environ.get('TIMETABLE_WORKER_TIMEOUT', max_solve_seconds * solve_rounds + 30))
+graceful_timeout = int(os.environ.get('TIMETABLE_GRACEFUL_TIMEOUT', max_solve_seconds * solve_rounds + 30))
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Freeze the preloaded heap so workers don't un-share it on the first GC pass"""
+    gc.freeze()
+    server.log.info("Dataset preloaded; %d objects frozen for copy-on-write sharing",
+                    gc.get_freeze_count())
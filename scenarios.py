@@ -0,0 +1,217 @@
+# scenarios.py - Solve many what-if variants of one dataset in parallel
+#
+# A scenario is a small delta against a base dataset, for example:
+#   {
+#     "name": "Theater closed",
+#     "remove_rooms": ["B07-Theater"],
+#     "instructors_on_leave": ["INS004"],
+#     "add_timeslots": [{"day": "Sunday", "start_time": "4:00 PM", "end_time": "5:30 PM"}]
+#   }
+#
+# The base dataset is shipped to each worker process once (pool initializer),
+# together with the course -> qualified-instructor index computed from it;
+# each task then only carries its delta. Results are ranked by placement rate
+# and then soft-constraint score.
+#
+# Scenarios share the pinned version's domain cache (DatasetSnapshot.
+# domain_cache): it is filled once before solving, a scenario without changes
+# uses it as is, and the others reuse the domains of every session their
+# delta leaves alone - same course record, same qualified instructors, no
+# room of its type added or removed and no timeslot change.
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from constraints import validate_constraint_set
+from dataset import parse_course, parse_instructor, parse_room, parse_timeslot
+from enhanced_csp_model import EnhancedCSPTimetable, count_qualified_instructors, select_schedulable_courses
+
+# delta key -> (collection, id attribute, parser for added records or None for removals)
+SCENARIO_OPERATIONS = {
+    'add_courses': ('courses', 'course_id', parse_course),
+    'remove_courses': ('courses', 'course_id', None),
+    'add_instructors': ('instructors', 'instructor_id', parse_instructor),
+    'instructors_on_leave': ('instructors', 'instructor_id', None),
+    'add_rooms': ('rooms', 'room_id', parse_room),
+    'remove_rooms': ('rooms', 'room_id', None),
+    'add_timeslots': ('timeslots', 'id', parse_timeslot),
+    'remove_timeslots': ('timeslots', 'id', None),
+}
+
+# Pool worker processes only: the base dataset, set by _init_worker
+_base = None
+
+
+def apply_scenario(base, delta):
+    """Return (courses, instructors, rooms, timeslots) for base + delta
+
+    `base` is a dict with the four collections (plus optional 'cohorts',
+    which scenarios leave unchanged). Raises ValueError on unknown
+    keys or malformed records so a whole batch can be validated up front.
+    """
+    if not isinstance(delta, dict):
+        raise ValueError('scenario must be an object')
+    unknown = set(delta) - set(SCENARIO_OPERATIONS) - {'name'}
+    if unknown:
+        raise ValueError(f"unknown scenario key(s): {', '.join(sorted(unknown))}")
+
+    collections = {name: list(items) for name, items in base.items() if name != 'cohorts'}
+    for key, (collection, id_attr, parse) in SCENARIO_OPERATIONS.items():
+        records = delta.get(key, [])
+        if not isinstance(records, list):
+            raise ValueError(f"'{key}' must be a list")
+        if parse is None:
+            removed = set(records)
+            collections[collection] = [item for item in collections[collection]
+                                       if getattr(item, id_attr) not in removed]
+        else:
+            try:
+                added = [parse(record) for record in records]
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"'{key}': missing field {e}")
+            added_ids = {getattr(item, id_attr) for item in added}
+            collections[collection] = [item for item in collections[collection]
+                                       if getattr(item, id_attr) not in added_ids] + added
+
+    return (collections['courses'], collections['instructors'],
+            collections['rooms'], collections['timeslots'])
+
+
+def solve_scenarios(base, scenarios, timeout=60, workers=None, seed=None, include_schedules=False,
+                    constraints=None, parameters=None, domain_cache=None):
+    """Solve every scenario in a process pool and return them ranked
+
+    Each scenario is validated before any solving starts. With a seed, each
+    scenario is solved with seed + index so comparisons are reproducible.
+    Every scenario uses the same constraint set (see constraints.py).
+    `domain_cache` is the base dataset version's cache, shared where
+    scenarios leave domains unchanged.
+    """
+    validate_constraint_set(constraints, parameters)
+    for index, delta in enumerate(scenarios):
+        try:
+            apply_scenario(base, delta)
+        except ValueError as e:
+            raise ValueError(f'scenario {index}: {e}')
+
+    workers = pool_size(workers, len(scenarios))
+    tasks = [(index, delta, timeout, None if seed is None else seed + index, include_schedules,
+              constraints, parameters)
+             for index, delta in enumerate(scenarios)]
+
+    if domain_cache is not None:
+        # Build the base domains here once, so every worker starts with them
+        courses = select_schedulable_courses(base['courses'], base['instructors'])
+        solver = EnhancedCSPTimetable(courses, base['instructors'], base['rooms'], base['timeslots'],
+                                      constraints, parameters, base.get('cohorts'), domain_cache)
+        solver.create_variables()
+        solver.create_domains()
+
+    if workers == 1:
+        # In the calling (web) process: pass the base explicitly, never via the
+        # module global, so concurrent requests keep their own pinned dataset
+        prepared = _prepare_base(base, domain_cache)
+        results = [_solve_one(task, prepared) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(base, domain_cache)) as pool:
+            results = list(pool.map(_solve_one, tasks))
+
+    # Rank: most sessions placed first, then lowest soft-constraint cost
+    results.sort(key=lambda r: (-r['placement_rate'], r['soft_score']))
+    for rank, result in enumerate(results, start=1):
+        result['rank'] = rank
+    return results
+
+
+def pool_size(workers, scenarios):
+    """Worker processes for a batch: as asked (default: one per core), at most one per core and scenario"""
+    cores = os.cpu_count() or 1
+    return max(1, min(workers or cores, cores, scenarios))
+
+
+def _prepare_base(base, domain_cache=None):
+    """The base dataset with its qualification index and domain cache"""
+    return {'collections': base, 'qualified_count': count_qualified_instructors(base['instructors']),
+            'domain_cache': domain_cache}
+
+
+def _init_worker(base, domain_cache=None):
+    """Keep the base dataset for this pool worker process"""
+    global _base
+    _base = _prepare_base(base, domain_cache)
+
+
+def _scenario_domains(base, delta):
+    """Domain cache for one scenario: the base domains its delta leaves unchanged"""
+    cache = base['domain_cache']
+    if cache is None or not any(delta.get(key) for key in SCENARIO_OPERATIONS):
+        return cache
+    if delta.get('add_timeslots') or delta.get('remove_timeslots'):
+        return None  # every domain is over the timeslots
+
+    collections = base['collections']
+    changed = {}  # delta key -> ids it adds, replaces or removes
+    added = {}
+    for key, (collection, id_attr, parse) in SCENARIO_OPERATIONS.items():
+        records = delta.get(key, [])
+        if parse is None:
+            changed[key] = set(records)
+        else:
+            added[key] = [parse(record) for record in records]
+            changed[key] = {getattr(item, id_attr) for item in added[key]}
+
+    touched = changed['add_courses'] | changed['remove_courses']
+    instructor_ids = changed['add_instructors'] | changed['instructors_on_leave']
+    for instructor in list(collections['instructors']) + added['add_instructors']:
+        if instructor.instructor_id in instructor_ids:
+            touched.update(instructor.qualified_courses)
+    room_ids = changed['add_rooms'] | changed['remove_rooms']
+    room_types = {room.type for room in list(collections['rooms']) + added['add_rooms'] if room.room_id in room_ids}
+
+    def unchanged(key, domain):
+        if key[0] in touched:
+            return False
+        # A domain without rooms may gain one from any room change
+        return not room_ids or (domain.rooms and domain.rooms[0].type not in room_types)
+
+    return {static_key: {key: domain for key, domain in domains.items() if unchanged(key, domain)}
+            for static_key, domains in list(cache.items())}
+
+
+def _solve_one(task, base=None):
+    """Solve one scenario against `base` (default: the pool worker's _base)"""
+    base = base or _base
+    index, delta, timeout, seed, include_schedules, constraints, parameters = task
+    if seed is not None:
+        random.seed(seed)
+
+    courses, instructors, rooms, timeslots = apply_scenario(base['collections'], delta)
+
+    # Reuse the base qualification index unless this scenario touches instructors
+    if delta.get('add_instructors') or delta.get('instructors_on_leave'):
+        qualified_count = count_qualified_instructors(instructors)
+    else:
+        qualified_count = base['qualified_count']
+    selected = select_schedulable_courses(courses, instructors, qualified_count)
+
+    started = time.time()
+    solver = EnhancedCSPTimetable(selected, instructors, rooms, timeslots, constraints, parameters,
+                                  cohorts=base['collections'].get('cohorts'),
+                                  domain_cache=_scenario_domains(base, delta))
+    solver.solve_enhanced(timeout_seconds=timeout)
+    export = solver.export_to_dict(diagnostics=False)  # only counts and score are kept
+
+    total = export['total_courses']
+    result = {
+        'index': index,
+        'name': delta.get('name', f'Scenario {index + 1}'),
+        'scheduled_courses': export['scheduled_courses'],
+        'total_courses': total,
+        'placement_rate': round(export['scheduled_courses'] / total, 4) if total else 0,
+        'soft_score': export['soft_score'],
+        'elapsed_seconds': round(time.time() - started, 2)
+    }
+    if include_schedules:
+        result['schedule'] = export['schedule']
+    return result
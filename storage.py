@@ -0,0 +1,339 @@
+# storage.py - Embedded SQLite store for the catalogue and generated timetables
+#
+# The catalogue (courses, instructors, rooms, timeslots, cohorts) is seeded from the
+# CSV files once and then edited row by row, so an add or delete touches a
+# single row instead of rewriting a whole file. Every catalogue write bumps
+# `catalogue_version` in the same transaction; other processes compare it to
+# the version of their in-memory snapshot and reload when it moves.
+#
+# Generated timetables are kept as history keyed by timetable_id, with their
+# entries indexed by instructor, room and day for cheap filtered queries.
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from enhanced_csp_model import Cohort, Course, Instructor, Room, Timeslot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS courses (
+    course_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    credits TEXT NOT NULL,
+    type TEXT NOT NULL,
+    enrollment INTEGER NOT NULL DEFAULT 0,
+    sections INTEGER NOT NULL DEFAULT 1,
+    hours REAL NOT NULL DEFAULT 0,
+    session_minutes INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS instructors (
+    instructor_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL,
+    unavailable_day TEXT NOT NULL,
+    qualified_courses TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    capacity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cohorts (
+    cohort_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    courses TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS timeslots (
+    position INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS timetables (
+    timetable_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    dataset_version INTEGER NOT NULL,
+    total_courses INTEGER NOT NULL,
+    scheduled_courses INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    statistics TEXT
+);
+CREATE TABLE IF NOT EXISTS timetable_entries (
+    timetable_id INTEGER NOT NULL REFERENCES timetables(timetable_id) ON DELETE CASCADE,
+    course_id TEXT NOT NULL,
+    section_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    room_id TEXT NOT NULL,
+    instructor_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_instructor ON timetable_entries (timetable_id, instructor_id);
+CREATE INDEX IF NOT EXISTS idx_entries_room ON timetable_entries (timetable_id, room_id);
+CREATE INDEX IF NOT EXISTS idx_entries_day ON timetable_entries (timetable_id, day);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('catalogue_version', 0);
+"""
+
+# Columns added after a table was first released: (table, column, definition).
+# Databases created by older versions get them via ALTER TABLE on open.
+MIGRATIONS = [
+    ('courses', 'enrollment', 'INTEGER NOT NULL DEFAULT 0'),
+    ('courses', 'sections', 'INTEGER NOT NULL DEFAULT 1'),
+    ('courses', 'hours', 'REAL NOT NULL DEFAULT 0'),
+    ('courses', 'session_minutes', 'INTEGER NOT NULL DEFAULT 0'),
+]
+
+
+class TimetableStorage:
+    """SQLite-backed store, safe to share between threads and forked workers
+
+    Each thread of each process gets its own connection (connections must not
+    cross a fork). The database runs in WAL mode so readers never block the
+    single writer.
+    """
+
+    def __init__(self, path='timetable.db'):
+        self.path = path
+        self._local = threading.local()
+        self._pid = os.getpid()
+        with self._transaction() as conn:
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn):
+        for table, column, definition in MIGRATIONS:
+            existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if column not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    # ------------------------------------------------------------------
+    # Connections and transactions
+    # ------------------------------------------------------------------
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            # Forked worker: drop connections inherited from the parent
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self, write=True):
+        """Run a block in one transaction (IMMEDIATE for writes, serializing writers)"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _bump_version(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'catalogue_version'")
+        return conn.execute("SELECT value FROM meta WHERE key = 'catalogue_version'").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Catalogue
+    # ------------------------------------------------------------------
+
+    def catalogue_version(self):
+        """Current catalogue version (one indexed lookup, cheap enough per request)"""
+        row = self._connection().execute(
+            "SELECT value FROM meta WHERE key = 'catalogue_version'").fetchone()
+        return row[0]
+
+    def is_empty(self):
+        conn = self._connection()
+        return conn.execute('SELECT COUNT(*) FROM courses').fetchone()[0] == 0
+
+    def import_catalogue(self, courses, instructors, rooms, timeslots, cohorts=()):
+        """Replace the whole catalogue in one transaction; returns the new version"""
+        with self._transaction() as conn:
+            for table in ('courses', 'instructors', 'rooms', 'timeslots', 'cohorts'):
+                conn.execute(f'DELETE FROM {table}')
+            conn.executemany('INSERT INTO courses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             [self._course_row(c) for c in courses])
+            conn.executemany('INSERT INTO instructors VALUES (?, ?, ?, ?, ?)',
+                             [self._instructor_row(i) for i in instructors])
+            conn.executemany('INSERT INTO rooms VALUES (?, ?, ?)',
+                             [self._room_row(r) for r in rooms])
+            conn.executemany('INSERT INTO timeslots VALUES (?, ?, ?, ?)',
+                             [(position, t.day, t.start_time, t.end_time)
+                              for position, t in enumerate(timeslots)])
+            conn.executemany('INSERT INTO cohorts VALUES (?, ?, ?)',
+                             [self._cohort_row(c) for c in cohorts])
+            return self._bump_version(conn)
+
+    def load_catalogue(self):
+        """Read a consistent copy of the catalogue: (version, courses, instructors, rooms, timeslots, cohorts)"""
+        with self._transaction(write=False) as conn:
+            version = conn.execute(
+                "SELECT value FROM meta WHERE key = 'catalogue_version'").fetchone()[0]
+            courses = [Course(r['course_id'], r['name'], r['credits'], r['type'], r['enrollment'],
+                              r['sections'], r['hours'], r['session_minutes'])
+                       for r in conn.execute('SELECT * FROM courses ORDER BY rowid')]
+            instructors = [Instructor(r['instructor_id'], r['name'], r['role'],
+                                      r['unavailable_day'], r['qualified_courses'])
+                           for r in conn.execute('SELECT * FROM instructors ORDER BY rowid')]
+            rooms = [Room(r['room_id'], r['type'], r['capacity'])
+                     for r in conn.execute('SELECT * FROM rooms ORDER BY rowid')]
+            timeslots = [Timeslot(r['day'], r['start_time'], r['end_time'])
+                         for r in conn.execute('SELECT * FROM timeslots ORDER BY position')]
+            cohorts = [Cohort(r['cohort_id'], r['name'], r['courses'])
+                       for r in conn.execute('SELECT * FROM cohorts ORDER BY rowid')]
+        return version, courses, instructors, rooms, timeslots, cohorts
+
+    def insert_course(self, course):
+        """Insert one course; raises ValueError if the ID exists. Returns the new version"""
+        with self._transaction() as conn:
+            try:
+                conn.execute('INSERT INTO courses VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self._course_row(course))
+            except sqlite3.IntegrityError:
+                raise ValueError('Course ID already exists')
+            return self._bump_version(conn)
+
+    def delete_course(self, course_id):
+        """Delete one course; raises KeyError if missing. Returns the new version"""
+        return self._delete('courses', 'course_id', course_id)
+
+    def upsert_instructor(self, instructor):
+        """Insert or replace one instructor. Returns the new version"""
+        return self.apply_batch('instructors', upserts=[instructor])
+
+    def delete_instructor(self, instructor_id):
+        """Delete one instructor; raises KeyError if missing. Returns the new version"""
+        return self._delete('instructors', 'instructor_id', instructor_id)
+
+    def upsert_room(self, room):
+        """Insert or replace one room. Returns the new version"""
+        return self.apply_batch('rooms', upserts=[room])
+
+    def delete_room(self, room_id):
+        """Delete one room; raises KeyError if missing. Returns the new version"""
+        return self._delete('rooms', 'room_id', room_id)
+
+    def apply_batch(self, table, upserts=(), deletes=()):
+        """Upsert and delete many rows of one catalogue table in a single transaction
+
+        All statements share one commit and one version bump, so importing
+        N rows costs one write instead of N. Returns the new version.
+        """
+        key_column, columns, to_row = self._catalogue_table(table)
+        with self._transaction() as conn:
+            conn.executemany(f'DELETE FROM {table} WHERE {key_column} = ?',
+                             [(key,) for key in deletes])
+            # ON CONFLICT ... DO UPDATE keeps the rowid, so edited rows keep their position
+            updates = ', '.join(f'{c} = excluded.{c}' for c in columns[1:])
+            conn.executemany(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) '
+                f'ON CONFLICT ({key_column}) DO UPDATE SET {updates}',
+                [to_row(item) for item in upserts])
+            return self._bump_version(conn)
+
+    def _catalogue_table(self, table):
+        return {
+            'courses': ('course_id', ('course_id', 'name', 'credits', 'type', 'enrollment', 'sections',
+                                      'hours', 'session_minutes'), self._course_row),
+            'instructors': ('instructor_id', ('instructor_id', 'name', 'role', 'unavailable_day',
+                                              'qualified_courses'), self._instructor_row),
+            'rooms': ('room_id', ('room_id', 'type', 'capacity'), self._room_row),
+            'cohorts': ('cohort_id', ('cohort_id', 'name', 'courses'), self._cohort_row),
+        }[table]
+
+    def _delete(self, table, key_column, key):
+        with self._transaction() as conn:
+            cursor = conn.execute(f'DELETE FROM {table} WHERE {key_column} = ?', (key,))
+            if cursor.rowcount == 0:
+                raise KeyError(key)
+            return self._bump_version(conn)
+
+    @staticmethod
+    def _course_row(course):
+        return (course.course_id, course.name, str(course.credits), course.type, course.enrollment,
+                course.sections, course.hours, course.session_minutes)
+
+    @staticmethod
+    def _instructor_row(instructor):
+        return (instructor.instructor_id, instructor.name, instructor.role,
+                instructor.unavailable_day, ','.join(instructor.qualified_courses))
+
+    @staticmethod
+    def _room_row(room):
+        return (room.room_id, room.type, int(room.capacity))
+
+    @staticmethod
+    def _cohort_row(cohort):
+        return (cohort.cohort_id, cohort.name, ','.join(cohort.courses))
+
+    # ------------------------------------------------------------------
+    # Timetable history
+    # ------------------------------------------------------------------
+
+    def save_timetable(self, result, dataset_version, statistics=None):
+        """Store an export_to_dict() result; returns its timetable_id"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'INSERT INTO timetables (created_at, dataset_version, total_courses, '
+                'scheduled_courses, payload, statistics) VALUES (?, ?, ?, ?, ?, ?)',
+                (time.time(), dataset_version, result['total_courses'],
+                 result['scheduled_courses'], json.dumps(result),
+                 json.dumps(statistics) if statistics is not None else None))
+            timetable_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT INTO timetable_entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(timetable_id, e['course_id'], e['section_id'], e['day'], e['start_time'],
+                  e['end_time'], e['room_id'], e['instructor_id']) for e in result['schedule']])
+        return timetable_id
+
+    def list_timetables(self, limit=50):
+        """Most recent timetables first, without their payloads"""
+        rows = self._connection().execute(
+            'SELECT timetable_id, created_at, dataset_version, total_courses, scheduled_courses '
+            'FROM timetables ORDER BY timetable_id DESC LIMIT ?', (limit,))
+        return [dict(row) for row in rows]
+
+    def get_timetable(self, timetable_id=None):
+        """Load a stored timetable (the latest when timetable_id is None), or None"""
+        conn = self._connection()
+        if timetable_id is None:
+            row = conn.execute('SELECT * FROM timetables ORDER BY timetable_id DESC LIMIT 1').fetchone()
+        else:
+            row = conn.execute('SELECT * FROM timetables WHERE timetable_id = ?',
+                               (timetable_id,)).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row['payload'])
+        result['timetable_id'] = row['timetable_id']
+        result['created_at'] = row['created_at']
+        result['dataset_version'] = row['dataset_version']
+        statistics = json.loads(row['statistics']) if row['statistics'] else None
+        return result, statistics
+
+    def query_entries(self, timetable_id, instructor_id=None, room_id=None, day=None):
+        """Entries of one timetable filtered by instructor, room and/or day (index-backed)"""
+        clauses, params = ['timetable_id = ?'], [timetable_id]
+        for column, value in (('instructor_id', instructor_id), ('room_id', room_id), ('day', day)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        rows = self._connection().execute(
+            'SELECT course_id, section_id, day, start_time, end_time, room_id, instructor_id '
+            f'FROM timetable_entries WHERE {" AND ".join(clauses)} ORDER BY rowid', params)
+        return [dict(row) for row in rows]
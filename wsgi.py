@@ -0,0 +1,17 @@
+# ============================================================================
+# CSP TimetableAI - Intelligent Scheduling System
+# Production WSGI Entry Point
+#
+# © 2025 Roqia. All Rights Reserved.
+# This software is proprietary and confidential.
+# ============================================================================
+#
+# Run with:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# gunicorn.conf.py preloads this module in the master process, so the CSV
+# data is parsed once and shared copy-on-write by every forked worker.
+
+from app import create_app
+
+app = create_app()